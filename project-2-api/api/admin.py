@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Post, Comment, Product, Order, OrderItem, Address, ShoppingCart, CartItem, UserProfile
+from .models import Post, Comment, Product, Order, OrderItem, Address, ShoppingCart, CartItem, UserProfile, StockReservation
+from .services.image_variants import get_variant_urls
 
 # STAP 5: ENHANCED PRODUCT ADMIN MET IMAGE SUPPORT
 @admin.register(Product)
@@ -46,9 +47,12 @@ class ProductAdmin(admin.ModelAdmin):
     def image_thumbnail(self, obj):
         """Display small thumbnail in list view"""
         if obj.image:
+            # Gebruik de thumbnail variant i.p.v. de originele upload als die er is
+            variants = get_variant_urls(obj)
+            url = variants['thumbnail']['jpeg'] if variants and 'thumbnail' in variants else obj.image.url
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit: cover; border-radius: 4px;" />',
-                obj.image.url
+                url
             )
         return "Geen afbeelding"
     image_thumbnail.short_description = 'Afbeelding'
@@ -101,6 +105,15 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'customer_email', 'customer_name']
     ordering = ['-created_at']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
+    
+    def save_model(self, request, obj, form, change):
+        # Alleen de gewijzigde kolommen: een status wijziging is één smalle UPDATE
+        # (Order.save voegt BTW en totaal toe als verzendkosten of tarief wijzigen)
+        if change:
+            if form.changed_data:
+                obj.save(update_fields=[*form.changed_data, 'updated_at'])
+            return
+        super().save_model(request, obj, form, change)
 
 # Address Admin
 @admin.register(Address)
@@ -117,26 +130,45 @@ class AddressAdmin(admin.ModelAdmin):
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ['user', 'total_items', 'subtotal', 'updated_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email']
     
+    # Opgeslagen tellers: geen aggregaten over de items in de lijst query
     def total_items(self, obj):
-        return obj.get_total_items()
+        return obj.item_count
     total_items.short_description = 'Items'
+    total_items.admin_order_field = 'item_count'
     
     def subtotal(self, obj):
-        return f"€{obj.get_subtotal():.2f}"
+        return f"€{obj.subtotal:.2f}"
     subtotal.short_description = 'Subtotaal'
+    subtotal.admin_order_field = 'subtotal'
 
 # Cart Item Admin
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'product', 'quantity', 'total_price']
     list_filter = ['product__category']
+    list_select_related = ['cart__user', 'product']
     
     def total_price(self, obj):
         return f"€{obj.get_total_price():.2f}"
     total_price.short_description = 'Totaal'
 
+# Stock Reservation Admin (alleen inzien: voorraad loopt via services.inventory)
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'quantity', 'status', 'expires_at', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['order', 'product']
+    search_fields = ['order__order_number', 'product__name_nl']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Basic model registrations
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
@@ -0,0 +1,38 @@
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+
+from .services.product_search import search_products
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    ?search= via de full-text zoekindex, gerangschikt op relevantie.
+
+    Zonder zoekindex (andere database, migratie niet gedraaid) wordt de
+    standaard SearchFilter met search_fields gebruikt. Een expliciete
+    ?ordering= heeft voorrang op de relevantie volgorde. Meer treffers dan
+    PRODUCT_SEARCH_MAX_RESULTS worden afgekapt (view.search_truncated).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        product_ids = search_products(query)
+        if product_ids is None:
+            return super().filter_queryset(request, queryset, view)
+        # De view zet X-Search-Truncated als de zoeklimiet is bereikt
+        view.search_truncated = product_ids.truncated
+        if not product_ids:
+            return queryset.none()
+
+        queryset = queryset.filter(pk__in=product_ids)
+        if request.query_params.get(filters.OrderingFilter.ordering_param):
+            return queryset
+
+        search_rank = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(product_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.annotate(search_rank=search_rank).order_by('search_rank', 'pk')
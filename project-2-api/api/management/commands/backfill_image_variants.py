@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.models import Product
+from api.services.image_variants import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Genereer WebP/JPEG afbeelding varianten voor bestaande producten'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Ook producten met bestaande varianten opnieuw genereren')
+        parser.add_argument('--workers', type=int, default=4, help='Aantal parallelle workers (standaard 4)')
+        parser.add_argument('--product', type=int, action='append', dest='product_ids', help='Alleen dit product id (herhaalbaar)')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if options['product_ids']:
+            queryset = queryset.filter(pk__in=options['product_ids'])
+        product_ids = list(queryset.values_list('id', flat=True))
+
+        self.stdout.write(f"Varianten genereren voor {len(product_ids)} producten...")
+
+        def run(product_id):
+            close_old_connections()
+            try:
+                return generate_variants(product_id, force=options['force'])
+            finally:
+                close_old_connections()
+
+        generated = skipped = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = {executor.submit(run, product_id): product_id for product_id in product_ids}
+            for future in as_completed(futures):
+                product_id = futures[future]
+                try:
+                    if future.result() is None:
+                        skipped += 1
+                    else:
+                        generated += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Product {product_id}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Klaar: {generated} gegenereerd, {skipped} overgeslagen, {failed} mislukt"
+        ))
@@ -0,0 +1,38 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Product
+from api.serializers import ProductSerializer
+from api.services.catalog_fragments import render_fragment
+
+
+class Command(BaseCommand):
+    help = 'Schrijf een catalogus snapshot (JSONL) voor de serverless products handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Doelbestand (standaard settings.CATALOG_SNAPSHOT_PATH)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Producten per database fetch (standaard 500)')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.CATALOG_SNAPSHOT_PATH
+        chunk_size = max(1, options['chunk_size'])
+
+        # Zelfde basis queryset en volgorde als ProductViewSet
+        queryset = Product.objects.filter(is_active=True).order_by('name_nl', 'id')
+
+        # Eerst naar een tijdelijk bestand: de handler leest nooit een half snapshot
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'wb') as stream:
+            header = {'snapshot': 1, 'generated_at': timezone.now().isoformat()}
+            stream.write(json.dumps(header).encode('utf-8') + b'\n')
+            written = 0
+            for product in queryset.iterator(chunk_size=chunk_size):
+                stream.write(render_fragment(ProductSerializer(product).data) + b'\n')
+                written += 1
+        os.replace(temporary_path, path)
+
+        self.stdout.write(self.style.SUCCESS(f"Klaar: {written} producten in {path}"))
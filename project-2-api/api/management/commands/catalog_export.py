@@ -0,0 +1,58 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from api.models import Product
+from api.management.commands.catalog_import import IMPORT_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Exporteer producten naar CSV of JSONL (zelfde kolommen als catalog_import)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Doelbestand, of '-' voor stdout (standaard)")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Standaard afgeleid van de extensie')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rijen per database fetch (standaard 2000)')
+        parser.add_argument('--active-only', action='store_true', help='Alleen actieve producten')
+        parser.add_argument('--category', help='Alleen deze categorie')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        queryset = Product.objects.order_by('id')
+        if options['active_only']:
+            queryset = queryset.filter(is_active=True)
+        if options['category']:
+            queryset = queryset.filter(category=options['category'])
+        rows = queryset.values_list(*IMPORT_FIELDS).iterator(chunk_size=max(1, options['chunk_size']))
+
+        if path == '-':
+            stream = self.stdout
+        else:
+            try:
+                stream = open(path, 'w', encoding='utf-8', newline='')
+            except OSError as e:
+                raise CommandError(f"Kan {path} niet schrijven: {e}")
+
+        count = 0
+        try:
+            if file_format == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(IMPORT_FIELDS)
+                for row in rows:
+                    writer.writerow(['' if value is None else value for value in row])
+                    count += 1
+            else:
+                for row in rows:
+                    line = json.dumps(dict(zip(IMPORT_FIELDS, row)), cls=DjangoJSONEncoder, ensure_ascii=False)
+                    stream.write(line + '\n')
+                    count += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+
+        # Op stderr zodat de export naar stdout schoon blijft
+        self.stderr.write(self.style.SUCCESS(f"Klaar: {count} producten geëxporteerd"))
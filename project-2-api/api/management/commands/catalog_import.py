@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import sys
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Product, ShoppingCart
+from api.services import product_search
+from api.services.cart import recalculate_cart_totals
+from api.services.catalog_cache import bump_catalog_version
+from api.services.featured_products import bump_featured_version
+
+# Kolommen die een leveranciers feed mag bevatten (sku is de upsert sleutel)
+IMPORT_FIELDS = (
+    'sku', 'name_nl', 'description', 'short_description', 'features', 'category',
+    'price', 'original_price', 'stock', 'low_stock_threshold', 'is_active', 'is_featured',
+)
+DECIMAL_FIELDS = ('price', 'original_price')
+BOOLEAN_VALUES = {
+    '1': True, 'true': True, 't': True, 'yes': True, 'y': True, 'ja': True, 'j': True,
+    '0': False, 'false': False, 'f': False, 'no': False, 'n': False, 'nee': False,
+}
+
+
+class Command(BaseCommand):
+    help = 'Importeer producten uit CSV of JSONL (upsert op sku, in batches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV of JSONL bestand, of '-' voor stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Standaard afgeleid van de extensie')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rijen per batch (standaard 1000)')
+        parser.add_argument('--delimiter', default=',', help="CSV scheidingsteken (standaard ',')")
+        parser.add_argument('--dry-run', action='store_true', help='Alleen valideren, niets opslaan')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = max(1, options['batch_size'])
+
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(path, encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(f"Kan {path} niet openen: {e}")
+
+        created = updated = invalid = 0
+        with stream:
+            rows = self.read_rows(stream, file_format, options['delimiter'])
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                products, errors = self.build_batch(batch)
+                invalid += errors
+                if not options['dry_run'] and products:
+                    batch_created, batch_updated = self.save_batch(products)
+                    created += batch_created
+                    updated += batch_updated
+                self.stdout.write(f"Batch van {len(batch)} rijen verwerkt (regel {batch[-1][0]})")
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Klaar: {created} aangemaakt, {updated} bijgewerkt, {invalid} ongeldig"
+        ))
+
+    def read_rows(self, stream, file_format, delimiter):
+        """Geeft (regelnummer, dict) per rij, zonder het bestand in te lezen"""
+        if file_format == 'csv':
+            reader = csv.DictReader(stream, delimiter=delimiter)
+            unknown = set(reader.fieldnames or []) - set(IMPORT_FIELDS)
+            if unknown:
+                self.stderr.write(f"Onbekende kolommen genegeerd: {', '.join(sorted(unknown))}")
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                self.stderr.write(f"Regel {line_number}: ongeldige JSON ({e})")
+                continue
+            yield line_number, row
+
+    def clean_row(self, row):
+        """Converteer en valideer de bekende kolommen met de model velden"""
+        values = {}
+        for name in IMPORT_FIELDS:
+            if name not in row:
+                continue
+            value = row[name]
+            if isinstance(value, str):
+                value = value.strip()
+                # Nederlandse feeds gebruiken vaak een komma als decimaal teken
+                if name in DECIMAL_FIELDS and ',' in value and '.' not in value:
+                    value = value.replace(',', '.')
+                elif name in ('is_active', 'is_featured'):
+                    value = BOOLEAN_VALUES.get(value.lower(), value)
+            field = Product._meta.get_field(name)
+            if value in ('', None) and field.null:
+                values[name] = None
+                continue
+            if name == 'sku' and not value:
+                continue
+            values[name] = field.clean(value, None)
+        return values
+
+    def build_batch(self, batch):
+        """Ongesaved Product objecten per sku (laatste rij wint), plus het aantal fouten"""
+        products = {}
+        errors = 0
+        for line_number, row in batch:
+            try:
+                values = self.clean_row(row)
+            except ValidationError as e:
+                errors += 1
+                self.stderr.write(f"Regel {line_number}: {'; '.join(e.messages)}")
+                continue
+
+            product = Product(**values)
+            if not product.sku:
+                # Zelfde formaat als Product.save, zonder per rij te saven
+                product.sku = product.generate_sku()
+            # Alleen de aangeleverde kolommen overschrijven bij een bestaand product
+            product._import_fields = frozenset(values) - {'sku'}
+            products[product.sku] = product
+        return list(products.values()), errors
+
+    def save_batch(self, products):
+        """Upsert één batch; zoekindex en cache worden één keer per batch bijgewerkt"""
+        skus = [product.sku for product in products]
+
+        # Groepeer op aangeleverde kolommen: ontbrekende kolommen blijven ongemoeid
+        groups = {}
+        for product in products:
+            groups.setdefault(product._import_fields, []).append(product)
+
+        with transaction.atomic():
+            existing = set(Product.objects.filter(sku__in=skus).values_list('sku', flat=True))
+            for fields, group in groups.items():
+                Product.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=sorted(fields) + ['updated_at'],
+                )
+
+            product_ids = list(Product.objects.filter(sku__in=skus).values_list('id', flat=True))
+            product_search.index_products(product_ids)
+            if 'price' in set().union(*groups):
+                recalculate_cart_totals(ShoppingCart.objects.filter(items__product_id__in=product_ids))
+            transaction.on_commit(bump_catalog_version)
+            transaction.on_commit(bump_featured_version)
+
+        return len(skus) - len(existing), len(existing)
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Product
+from api.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = 'Zet product afbeeldingen om naar content-addressed namen en verwijder duplicaten'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Alleen tonen wat er zou gebeuren')
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Oude bestanden verwijderen die na het omzetten door geen product meer gebruikt worden',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        products = (
+            Product.objects.exclude(image='').exclude(image__isnull=True)
+            .only('id', 'image', 'image_variants')
+            .order_by('id')
+        )
+
+        replaced_names = set()
+        rewritten = missing = 0
+        stored_names = set()
+
+        for product in products.iterator(chunk_size=500):
+            storage = product.image.storage
+            if not isinstance(storage, ContentAddressedStorage):
+                storage = ContentAddressedStorage()
+
+            old_name = product.image.name
+            if not storage.exists(old_name):
+                missing += 1
+                self.stderr.write(f"Product {product.pk}: bestand ontbreekt ({old_name})")
+                continue
+
+            with storage.open(old_name, 'rb') as content:
+                new_name = storage.content_name(old_name, content)
+                if new_name == old_name:
+                    stored_names.add(new_name)
+                    continue
+
+                self.stdout.write(f"Product {product.pk}: {old_name} -> {new_name}")
+                if dry_run:
+                    stored_names.add(new_name)
+                    replaced_names.add(old_name)
+                    rewritten += 1
+                    continue
+
+                # Schrijft niets als dezelfde inhoud al onder new_name staat
+                new_name = storage.save(old_name, content)
+
+            # Varianten blijven geldig (zelfde inhoud), alleen de bron naam verandert
+            image_variants = product.image_variants or {}
+            if image_variants.get('source') == old_name:
+                image_variants = {**image_variants, 'source': new_name}
+
+            # Via save(), zodat de Product signals de catalogus en featured caches
+            # ongeldig maken; alleen als de afbeelding intussen niet vervangen is
+            with transaction.atomic():
+                current = (
+                    Product.objects.select_for_update()
+                    .filter(pk=product.pk, image=old_name)
+                    .only('id', 'sku', 'image', 'image_variants')
+                    .first()
+                )
+                if current is not None:
+                    current.image = new_name
+                    current.image_variants = image_variants
+                    current.save(update_fields=['image', 'image_variants', 'updated_at'])
+            stored_names.add(new_name)
+            replaced_names.add(old_name)
+            rewritten += 1
+
+        deleted = 0
+        if options['delete_originals'] and not dry_run:
+            still_used = set(
+                Product.objects.filter(image__in=replaced_names).values_list('image', flat=True)
+            )
+            storage = ContentAddressedStorage()
+            for name in sorted(replaced_names - still_used - stored_names):
+                if storage.exists(name):
+                    storage.delete(name)
+                    deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry-run] ' if dry_run else ''}{rewritten} producten omgezet naar "
+            f"{len(stored_names)} unieke bestanden, {deleted} oude bestanden verwijderd, "
+            f"{missing} ontbrekend"
+        ))
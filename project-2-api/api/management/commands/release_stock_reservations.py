@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import StockReservation
+from api.services.inventory import release_reservations
+
+
+class Command(BaseCommand):
+    help = 'Geef verlopen voorraad reserveringen (onbetaalde orders) vrij'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Reserveringen per batch (standaard 500)')
+        parser.add_argument(
+            '--loop', type=int, metavar='SECONDEN',
+            help='Blijf draaien en controleer elke SECONDEN seconden',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        while True:
+            released = 0
+            while True:
+                expired = list(
+                    StockReservation.objects.filter(status='held', expires_at__lt=timezone.now())
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:chunk_size]
+                )
+                if not expired:
+                    break
+                released += release_reservations(StockReservation.objects.filter(pk__in=expired))
+
+            self.stdout.write(self.style.SUCCESS(f"Klaar: {released} verlopen reserveringen vrijgegeven"))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
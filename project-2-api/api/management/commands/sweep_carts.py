@@ -0,0 +1,140 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import CartItem, ShoppingCart
+from api.services.cart import recalculate_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Verwijder verlaten winkelwagens en verweesde items in kleine primary key batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=settings.CART_SWEEP_MAX_AGE_DAYS,
+            help=f'Dagen zonder activiteit (standaard {settings.CART_SWEEP_MAX_AGE_DAYS})',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Wagens per batch (standaard 1000)')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Pauze tussen batches in seconden (standaard 0.1)')
+        parser.add_argument('--dry-run', action='store_true', help='Alleen tellen wat er verwijderd zou worden')
+        parser.add_argument(
+            '--loop', type=int, metavar='SECONDEN',
+            help='Blijf draaien en herhaal de sweep elke SECONDEN seconden',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options)
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
+
+    def sweep(self, options):
+        cutoff = timezone.now() - timedelta(days=options['max_age'])
+        chunk_size = max(1, options['chunk_size'])
+        started = time.monotonic()
+
+        stale_carts = ShoppingCart.objects.filter(updated_at__lt=cutoff)
+        orphan_items = CartItem.objects.filter(product__is_active=False, updated_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"Zou verwijderen: {stale_carts.count()} wagens, "
+                f"{CartItem.objects.filter(cart__in=stale_carts).count()} items, "
+                f"{orphan_items.exclude(cart__in=stale_carts).count()} verweesde items"
+            )
+            return
+
+        carts = items = batches = 0
+        for start, end in self.windows(stale_carts, chunk_size):
+            deleted_carts, deleted_items = self.delete_carts(start, end, cutoff)
+            carts += deleted_carts
+            items += deleted_items
+            batches += 1
+            if deleted_carts:
+                time.sleep(options['sleep'])
+
+        orphans = 0
+        for start, end in self.windows(orphan_items, chunk_size):
+            deleted = self.delete_orphan_items(start, end, cutoff)
+            orphans += deleted
+            batches += 1
+            if deleted:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Klaar: {carts} wagens, {items} items en {orphans} verweesde items verwijderd "
+            f"in {batches} batches ({time.monotonic() - started:.1f}s)"
+        ))
+
+    def windows(self, queryset, chunk_size):
+        """
+        Primary key vensters [start, end) die bij het eerstvolgende passende id beginnen.
+
+        Lege stukken van de id reeks (actieve wagens) worden overgeslagen in
+        plaats van venster voor venster afgelopen.
+        """
+        start = 0
+        while True:
+            start = queryset.filter(id__gte=start).order_by('id').values_list('id', flat=True).first()
+            if start is None:
+                return
+            yield start, start + chunk_size
+            start += chunk_size
+
+    def delete_carts(self, start, end, cutoff):
+        """
+        Eén batch verlaten wagens (id in [start, end)) met hun items.
+
+        Raw DELETEs: geen per-item signals die tellers bijwerken van een wagen
+        die toch verdwijnt. De wagens worden eerst gelockt en opnieuw op
+        updated_at gecontroleerd, zodat een wagen die net weer gebruikt wordt blijft staan.
+        """
+        cart_table = connection.ops.quote_name(ShoppingCart._meta.db_table)
+        item_table = connection.ops.quote_name(CartItem._meta.db_table)
+
+        with transaction.atomic():
+            cart_ids = list(
+                ShoppingCart.objects.select_for_update()
+                .filter(id__gte=start, id__lt=end, updated_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', flat=True)
+            )
+            if not cart_ids:
+                return 0, 0
+
+            placeholders = ', '.join(['%s'] * len(cart_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {item_table} WHERE cart_id IN ({placeholders})", cart_ids)
+                items = cursor.rowcount
+                cursor.execute(f"DELETE FROM {cart_table} WHERE id IN ({placeholders})", cart_ids)
+                carts = cursor.rowcount
+        return carts, items
+
+    def delete_orphan_items(self, start, end, cutoff):
+        """Eén batch items (id in [start, end)) van inactieve producten; tellers van de wagens hertellen"""
+        item_table = connection.ops.quote_name(CartItem._meta.db_table)
+
+        with transaction.atomic():
+            rows = list(
+                CartItem.objects.select_for_update(of=('self',))
+                .filter(id__gte=start, id__lt=end, product__is_active=False, updated_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', 'cart_id')
+            )
+            if not rows:
+                return 0
+
+            item_ids = [item_id for item_id, _ in rows]
+            placeholders = ', '.join(['%s'] * len(item_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {item_table} WHERE id IN ({placeholders})", item_ids)
+                deleted = cursor.rowcount
+
+            # Geen updated_at: opruimen is geen activiteit van de klant
+            recalculate_cart_totals(ShoppingCart.objects.filter(pk__in={cart_id for _, cart_id in rows}))
+        return deleted
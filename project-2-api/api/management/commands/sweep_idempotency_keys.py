@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Verwijder verlopen Idempotency-Key responses in kleine batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Sleutels per batch (standaard 1000)')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Pauze tussen batches in seconden (standaard 0.1)')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        now = timezone.now()
+        deleted = 0
+        while True:
+            expired = list(
+                IdempotencyKey.objects.filter(expires_at__lt=now)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not expired:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=expired).delete()[0]
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Klaar: {deleted} verlopen sleutels verwijderd"))
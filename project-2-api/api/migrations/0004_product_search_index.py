@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE api_product_search (
+        product_id bigint PRIMARY KEY REFERENCES api_product (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX api_product_search_document_gin ON api_product_search USING gin (document)",
+    """
+    INSERT INTO api_product_search (product_id, document)
+    SELECT id,
+           setweight(to_tsvector('dutch', coalesce(name_nl, '')), 'A') ||
+           setweight(to_tsvector('dutch', coalesce(short_description, '')), 'B') ||
+           setweight(to_tsvector('dutch', coalesce(features, '')), 'C') ||
+           setweight(to_tsvector('dutch', coalesce(description, '')), 'D')
+    FROM api_product
+    """,
+]
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE api_product_search USING fts5(
+        name_nl, short_description, features, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO api_product_search (rowid, name_nl, short_description, features, description)
+    SELECT id, name_nl, short_description, features, description FROM api_product
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        'postgresql': POSTGRES_CREATE,
+        'sqlite': SQLITE_CREATE,
+    }.get(schema_editor.connection.vendor)
+    if statements is None:
+        # Andere databases gebruiken de icontains fallback
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute("DROP TABLE IF EXISTS api_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_paymenttransaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:38
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Product afbeelding (max 5MB)', null=True, storage=api.storage.get_product_image_storage, upload_to='products/'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:46
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_counters(apps, schema_editor):
+    # Bewust hier uitgeschreven (niet uit api.services): de migratie blijft
+    # werken als de service later verandert
+    ShoppingCart = apps.get_model('api', 'ShoppingCart')
+    CartItem = apps.get_model('api', 'CartItem')
+
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    ShoppingCart.objects.update(
+        item_count=Coalesce(
+            Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=models.IntegerField()),
+            0,
+        ),
+        subtotal=Coalesce(
+            Subquery(
+                items.annotate(total=Sum(F('quantity') * F('product__price'))).values('total'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_product_image_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Totaal aantal stuks'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Som van aantal x productprijs (incl. BTW)', max_digits=10),
+        ),
+        migrations.RunPython(backfill_cart_counters, migrations.RunPython.noop),
+    ]
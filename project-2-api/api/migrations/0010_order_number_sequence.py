@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:55
+
+import datetime
+
+from django.db import migrations, models
+
+
+def seed_order_number_sequences(apps, schema_editor):
+    # Hoogste bestaande volgnummer per dag, zodat de teller nooit een uitgegeven nummer herhaalt
+    Order = apps.get_model('api', 'Order')
+    OrderNumberSequence = apps.get_model('api', 'OrderNumberSequence')
+
+    last_values = {}
+    for order_number in Order.objects.filter(order_number__startswith='HC').values_list('order_number', flat=True).iterator():
+        try:
+            day = datetime.datetime.strptime(order_number[2:10], '%Y%m%d').date()
+            sequence = int(order_number[10:])
+        except ValueError:
+            continue
+        last_values[day] = max(last_values.get(day, 0), sequence)
+
+    OrderNumberSequence.objects.bulk_create([
+        OrderNumberSequence(day=day, last_value=last_value) for day, last_value in last_values.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_shoppingcart_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ordernummer reeks',
+                'verbose_name_plural': 'Ordernummer reeksen',
+            },
+        ),
+        migrations.RunPython(seed_order_number_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('held', 'Gereserveerd'), ('committed', 'Definitief'), ('released', 'Vrijgegeven')], default='held', max_length=10)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='api.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='api.product')),
+            ],
+            options={
+                'verbose_name': 'Voorraad reservering',
+                'verbose_name_plural': 'Voorraad reserveringen',
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='stockres_status_expires_idx')],
+            },
+        ),
+    ]
@@ -1,9 +1,11 @@
 # api/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
 import uuid
-import datetime
+
+from .storage import get_product_image_storage
 
 # Post model (je bestaande code blijft hetzelfde)
 class Post(models.Model):
@@ -42,11 +44,20 @@ class Product(models.Model):
     # STAP 2: IMAGE FIELD TOEGEVOEGD
     image = models.ImageField(
         upload_to='products/',
+        storage=get_product_image_storage,  # Content-addressed: geen dubbele bestanden
         null=True,
         blank=True,
         help_text="Product afbeelding (max 5MB)"
     )
     
+    # Verkleinde WebP/JPEG varianten (thumbnail, card, detail, zoom) - zie services/image_variants.py
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Automatisch gegenereerde afbeelding varianten"
+    )
+    
     price = models.DecimalField(
         max_digits=8, 
         decimal_places=2,
@@ -121,6 +132,34 @@ class Product(models.Model):
         ordering = ['-is_featured', '-created_at']
         verbose_name = 'Product'
         verbose_name_plural = 'Producten'
+        indexes = [
+            # Keyset pagination van de webshop catalogus (name_nl, id)
+            models.Index(
+                fields=['name_nl', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_name_id_idx',
+            ),
+            # Conditional GET validators (max updated_at van de catalogus)
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(is_active=True),
+                name='product_active_updated_idx',
+            ),
+        ]
+    
+    # Geladen stand van deze velden, zodat signals wijzigingen zien zonder extra query
+    LOADED_STATE_FIELDS = ('is_featured', 'is_active', 'price')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_state()
+        return instance
+    
+    def remember_loaded_state(self):
+        self._loaded_state = {
+            name: self.__dict__[name] for name in self.LOADED_STATE_FIELDS if name in self.__dict__
+        }
     
     def __str__(self):
         return self.name_nl
@@ -130,6 +169,8 @@ class Product(models.Model):
         if not self.sku:
             self.sku = self.generate_sku()
         super().save(*args, **kwargs)
+        # Na de post_save signals: de opgeslagen stand is de nieuwe vergelijkingsbasis
+        self.remember_loaded_state()
     
     def generate_sku(self):
         """Generate unique SKU for product"""
@@ -291,6 +332,17 @@ class ShoppingCart(models.Model):
     """Winkelwagen sessie management"""
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    
+    # Gedenormaliseerde tellers, bijgewerkt met F() bij elke CartItem wijziging (zie services/cart.py)
+    item_count = models.PositiveIntegerField(default=0, editable=False, help_text="Totaal aantal stuks")
+    subtotal = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="Som van aantal x productprijs (incl. BTW)"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -302,10 +354,10 @@ class ShoppingCart(models.Model):
         return f"Winkelwagen {self.user.email}"
     
     def get_total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.item_count
     
     def get_subtotal(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return self.subtotal
     
     def get_tax_amount(self):
         return self.get_subtotal() * Decimal('0.21')  # 21% Nederlandse BTW
@@ -327,6 +379,13 @@ class CartItem(models.Model):
         verbose_name_plural = 'Winkelwagen Items'
         unique_together = ['cart', 'product']
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Geladen stand, zodat signals alleen het verschil op de wagen tellers boeken
+        instance._loaded_state = (instance.__dict__.get('product_id'), instance.__dict__.get('quantity'))
+        return instance
+    
     def __str__(self):
         return f"{self.product.name_nl} x{self.quantity}"
     
@@ -403,6 +462,37 @@ class Order(models.Model):
         verbose_name = 'Bestelling'
         verbose_name_plural = 'Bestellingen'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination (-created_at, id): staff overzicht en per klant
+            models.Index(fields=['-created_at', 'id'], name='order_created_id_idx'),
+            models.Index(fields=['user', '-created_at', 'id'], name='order_user_created_id_idx'),
+        ]
+    
+    # BTW en totaal hangen (naast het subtotaal) af van deze velden
+    TOTALS_INPUT_FIELDS = ('shipping_cost', 'tax_rate')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_totals_inputs()
+        return instance
+    
+    def remember_totals_inputs(self):
+        self._loaded_totals_inputs = {
+            name: self.__dict__[name] for name in self.TOTALS_INPUT_FIELDS if name in self.__dict__
+        }
+    
+    def totals_inputs_changed(self, update_fields=None):
+        """Verzendkosten of BTW tarief gewijzigd sinds het laden (dan kloppen BTW en totaal niet meer)"""
+        if self._state.adding:
+            return False
+        loaded = getattr(self, '_loaded_totals_inputs', {})
+        deferred = self.get_deferred_fields()
+        return any(
+            name not in deferred and (name not in loaded or loaded[name] != getattr(self, name))
+            for name in self.TOTALS_INPUT_FIELDS
+            if update_fields is None or name in update_fields
+        )
     
     def __str__(self):
         if self.user:
@@ -415,39 +505,47 @@ class Order(models.Model):
             self.order_number = self.generate_order_number()
         
         # Set customer info from user if available
-        if self.user and not self.customer_email:
+        if self.user_id and not self.customer_email:
             self.customer_email = self.user.email
             self.customer_name = f"{self.user.first_name} {self.user.last_name}".strip() or self.user.username
         
-        # Calculate totals
-        self.calculate_totals()
+        # Totalen zijn opgeslagen waarden: ze veranderen met de regels (OrderItem
+        # signals, recalculate_totals), niet bij elke status wijziging. Gewijzigde
+        # verzendkosten of BTW (admin, PATCH) rekenen BTW en totaal hier mee.
+        update_fields = kwargs.get('update_fields')
+        if self.totals_inputs_changed(update_fields):
+            self.apply_tax_and_total()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'tax_amount', 'total_amount'}
         super().save(*args, **kwargs)
+        self.remember_totals_inputs()
     
     def generate_order_number(self):
-        """Genereer uniek Nederlands ordernummer"""
-        now = datetime.datetime.now()
-        prefix = f"HC{now.year}{now.month:02d}{now.day:02d}"
+        """Genereer uniek Nederlands ordernummer (uit de dagteller, zonder scan over orders)"""
+        from api.services.order_numbers import allocate_order_number
         
-        # Find the last order of the day
-        last_order = Order.objects.filter(
-            order_number__startswith=prefix
-        ).order_by('-order_number').first()
-        
-        if last_order:
-            last_sequence = int(last_order.order_number[-4:])
-            sequence = last_sequence + 1
-        else:
-            sequence = 1
-            
-        return f"{prefix}{sequence:04d}"
-    
-    def calculate_totals(self):
-        """Bereken Nederlandse BTW en totalen"""
-        items_total = sum(item.total_price for item in self.items.all())
+        return allocate_order_number()
+    
+    def calculate_totals(self, items=None):
+        """Bereken Nederlandse BTW en totalen (uit `items`, of de opgeslagen regels)"""
+        if items is None:
+            items = self.items.all()
+        items_total = sum(item.total_price for item in items)
         self.subtotal = items_total
+        self.apply_tax_and_total()
+    
+    def apply_tax_and_total(self):
+        """BTW en totaal uit het (opgeslagen) subtotaal, tarief en verzendkosten"""
         self.tax_amount = self.subtotal * self.tax_rate
         self.total_amount = self.subtotal + self.tax_amount + self.shipping_cost
     
+    def recalculate_totals(self):
+        """Tel de opgeslagen totalen opnieuw uit de regels (één UPDATE) en ververs ze hier"""
+        from api.services.orders import recalculate_order_totals
+
+        recalculate_order_totals(Order.objects.filter(pk=self.pk), updated_at=timezone.now())
+        self.refresh_from_db(fields=['subtotal', 'tax_amount', 'total_amount', 'updated_at'])
+    
     def get_status_display_nl(self):
         """Nederlandse status weergave"""
         status_nl = {
@@ -514,6 +612,52 @@ class OrderItem(models.Model):
         return self.total_price
 
 
+# Ordernummer teller per dag (zie services.order_numbers)
+class OrderNumberSequence(models.Model):
+    """Laatst uitgegeven volgnummer per dag voor HC{YYYYMMDD}{NNNN} ordernummers"""
+    
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Ordernummer reeks'
+        verbose_name_plural = 'Ordernummer reeksen'
+    
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
+
+# Voorraad reservering per order regel (zie services.inventory)
+class StockReservation(models.Model):
+    """Voorraad die bij checkout is afgeboekt, tot de betaling slaagt of verloopt"""
+    
+    STATUS_CHOICES = [
+        ('held', 'Gereserveerd'),
+        ('committed', 'Definitief'),
+        ('released', 'Vrijgegeven'),
+    ]
+    
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Voorraad reservering'
+        verbose_name_plural = 'Voorraad reserveringen'
+        indexes = [
+            # Verlopen reserveringen opruimen (release_stock_reservations)
+            models.Index(fields=['status', 'expires_at'], name='stockres_status_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} ({self.status})"
+
+
 # Add this PaymentTransaction model to support Mollie integration
 class PaymentTransaction(models.Model):
     TRANSACTION_STATUS_CHOICES = [
@@ -547,3 +691,32 @@ class PaymentTransaction(models.Model):
     
     def __str__(self):
         return f"Payment {self.mollie_payment_id} - {self.status}"
+
+
+# Idempotency-Key header voor checkout en winkelwagen POSTs (zie services.idempotency)
+class IdempotencyKey(models.Model):
+    """Eerste response per (gebruiker, endpoint, sleutel), om herhaalde requests af te spelen"""
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=200)  # "POST /api/checkout/process/"
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    
+    # Leeg zolang het eerste request nog loopt
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.BinaryField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = 'Idempotency sleutel'
+        verbose_name_plural = 'Idempotency sleutels'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_user_scope_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
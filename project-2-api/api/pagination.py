@@ -0,0 +1,175 @@
+import json
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination, _reverse_ordering
+
+
+class CountedPaginator(Paginator):
+    """Django Paginator die een vooraf bekende telling gebruikt i.p.v. een COUNT query"""
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count is not None:
+            # Overschrijft de cached_property: geen COUNT(*) meer nodig
+            self.count = count
+
+
+class CountedPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination die de telling van de view overneemt.
+
+    Views kunnen `get_known_count()` implementeren; geeft die None terug dan
+    valt de paginator terug op de normale COUNT query.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        known_count = None
+        if view is not None and hasattr(view, 'get_known_count'):
+            known_count = view.get_known_count()
+        self.django_paginator_class = partial(CountedPaginator, count=known_count)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination op een vaste keyset volgorde, met een echte samengestelde keyset.
+
+    DRF's CursorPagination zet alleen ordering[0] in de cursor en lost
+    gelijke waarden op met een OFFSET. Hier bevat de positie alle velden van
+    de volgorde (bijv. created_at en id) en wordt gefilterd met een tuple
+    vergelijking: (created_at, id) < (x, y). Met een unieke tie-breaker is
+    elke positie uniek, dus er is nooit een OFFSET nodig.
+
+    Negeert ?ordering= bewust: alleen de keyset volgorde (met bijpassende
+    index) geeft constante tijd per pagina.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(self.ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(str(value))
+        return json.dumps(values)
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def filter_after_position(self, queryset, position, reverse):
+        """(f1, f2, ...) voorbij de positie, per veld in zijn eigen richting"""
+        values = self.decode_position(position)
+        condition = Q()
+        for index, order in enumerate(self.ordering):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            step = Q(**{f'{field_name}__{lookup}': values[index]})
+            for previous, previous_value in zip(self.ordering[:index], values):
+                step &= Q(**{previous.lstrip('-'): previous_value})
+            condition |= step
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Zelfde flow als CursorPagination.paginate_queryset, met het positie
+        # filter over alle velden i.p.v. alleen ordering[0]
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = self.filter_after_position(queryset, current_position, reverse)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class CursorOptInPagination(CountedPageNumberPagination):
+    """
+    Page number pagination met opt-in keyset (cursor) pagination.
+
+    Met ?pagination=cursor (of een ?cursor= token) wordt op `view.cursor_ordering`
+    gepagineerd: geen OFFSET scans en geen COUNT query, en resultaten schuiven
+    niet door als er tussendoor rijen worden toegevoegd.
+    """
+
+    mode_query_param = 'pagination'
+
+    def use_cursor(self, request, view):
+        if not getattr(view, 'cursor_ordering', None):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetCursorPagination.cursor_query_param in request.query_params
+        )
+
+    def get_cursor_paginator(self, view):
+        paginator = KeysetCursorPagination()
+        paginator.ordering = view.cursor_ordering
+        paginator.page_size = self.page_size
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request, view):
+            self.cursor_paginator = self.get_cursor_paginator(view)
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
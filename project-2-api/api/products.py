@@ -1,17 +1,276 @@
+"""
+Serverless (Vercel) products handler.
+
+Cold start: alleen DJANGO_SETTINGS_MODULE wordt gezet; django.setup() (apps,
+DRF, database) gebeurt pas als er geen catalogus snapshot is. Met een snapshot
+(manage.py build_catalog_snapshot) wordt een compacte index in het geheugen
+gehouden en worden alleen de producten van de gevraagde pagina van schijf gelezen.
+
+Ondersteunt dezelfde filters als ProductViewSet: ?category=, ?is_active=,
+?search=, ?ordering= en ?page= (plus ?page_size=, max 100). De JSON wordt
+gestreamd in de DRF pagination envelope (count/next/previous/results).
+"""
+import json
+import logging
 import os
+import time
+from pathlib import Path
+
+_module_started = time.perf_counter()
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myapi.settings')
 
-import django
-django.setup()
+logger = logging.getLogger(__name__)
 
-from django.http import JsonResponse
-from api.models import Product
-from api.serializers import ProductSerializer
+PAGE_SIZE = 20  # Zelfde als REST_FRAMEWORK['PAGE_SIZE']
+MAX_PAGE_SIZE = 100
+ORDERING_FIELDS = ('id', 'name_nl', 'price', 'stock', 'created_at', 'updated_at')
+SEARCH_FIELDS = ('name_nl', 'short_description', 'description', 'features_list')
+DEFAULT_SNAPSHOT_PATH = Path(__file__).resolve().parent.parent / 'catalog_snapshot.jsonl'
 
-def handler(request):
-    if request.method == 'GET':
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return JsonResponse(serializer.data, safe=False)
+# Per container: is Django opgezet, geladen snapshot, eerste request al geweest
+_django_ready = False
+_snapshot = None
+_warm = False
+
+
+def setup_django():
+    """django.setup() pas bij de eerste request die de database nodig heeft"""
+    global _django_ready
+    if not _django_ready:
+        import django
+        django.setup()
+        _django_ready = True
+
+
+class CatalogSnapshot:
+    """
+    Compacte index van een snapshot bestand.
+
+    Per product alleen de filter/sorteer sleutels en de positie in het bestand;
+    de JSON van een product wordt pas gelezen als hij op de pagina staat.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generated_at = None
+        self.entries = []
+        with open(path, 'rb') as stream:
+            header = json.loads(stream.readline())
+            self.generated_at = header.get('generated_at')
+            offset = stream.tell()
+            for line in iter(stream.readline, b''):
+                item = json.loads(line)
+                search_text = ' '.join(
+                    ' '.join(value) if isinstance(value, list) else str(value or '')
+                    for value in (item.get(field) for field in SEARCH_FIELDS)
+                ).lower()
+                self.entries.append({
+                    'id': item['id'],
+                    'name_nl': item['name_nl'],
+                    'price': float(item['price']),
+                    'stock': item['stock'],
+                    'created_at': item['created_at'],
+                    'updated_at': item['updated_at'],
+                    'category': item['category'],
+                    'search': search_text,
+                    'offset': offset,
+                    'length': len(line),
+                })
+                offset += len(line)
+
+    def select(self, category=None, search=None, ordering=None):
+        entries = self.entries
+        if category:
+            entries = [entry for entry in entries if entry['category'] == category]
+        if search:
+            terms = search.lower().split()
+            entries = [entry for entry in entries if all(term in entry['search'] for term in terms)]
+        if ordering:
+            # Stabiel sorteren vanaf (name_nl, id): achterste sleutel eerst
+            entries = sorted(entries, key=lambda entry: (entry['name_nl'], entry['id']))
+            for field in reversed(ordering):
+                name = field.lstrip('-')
+                entries = sorted(entries, key=lambda entry: entry[name], reverse=field.startswith('-'))
+        return entries
+
+    def iter_items(self, entries):
+        """JSON bytes per product, direct uit het bestand (geen her-serialisatie)"""
+        with open(self.path, 'rb') as stream:
+            for entry in entries:
+                stream.seek(entry['offset'])
+                yield stream.read(entry['length']).rstrip(b'\n')
+
+
+def get_snapshot():
+    global _snapshot
+    path = os.environ.get('CATALOG_SNAPSHOT_PATH') or str(DEFAULT_SNAPSHOT_PATH)
+    if _snapshot is None or _snapshot.path != path:
+        if not os.path.exists(path):
+            return None
+        try:
+            _snapshot = CatalogSnapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Catalog snapshot {path} unreadable: {str(e)}")
+            return None
+    return _snapshot
+
+
+def parse_params(request):
+    """Filter, ordering en pagina parameters; ongeldige waarden vallen terug op de standaard"""
+    params = request.GET
+    ordering = [
+        field.strip() for field in params.get('ordering', '').split(',')
+        if field.strip().lstrip('-') in ORDERING_FIELDS
+    ]
+    try:
+        page = max(1, int(params.get('page', 1)))
+    except ValueError:
+        page = 1
+    try:
+        page_size = min(MAX_PAGE_SIZE, max(1, int(params.get('page_size', PAGE_SIZE))))
+    except ValueError:
+        page_size = PAGE_SIZE
+    return {
+        'category': params.get('category') or None,
+        'inactive': params.get('is_active', '').lower() in ('false', '0'),
+        'search': params.get('search', '').strip() or None,
+        'ordering': ordering,
+        'page': page,
+        'page_size': page_size,
+    }
+
+
+def page_url(request, page):
+    if page is None:
+        return None
+    query = request.GET.copy()
+    # Zoals DRF: pagina 1 zonder ?page=
+    if page == 1:
+        query.pop('page', None)
     else:
+        query['page'] = page
+    url = request.build_absolute_uri(request.path)
+    return f"{url}?{query.urlencode()}" if query else url
+
+
+def snapshot_page(snapshot, params):
+    """(count, iterator met JSON bytes) voor de gevraagde pagina uit het snapshot"""
+    if params['inactive']:
+        return 0, iter(())
+    entries = snapshot.select(params['category'], params['search'], params['ordering'])
+    start = (params['page'] - 1) * params['page_size']
+    return len(entries), snapshot.iter_items(entries[start:start + params['page_size']])
+
+
+def database_page(request, params):
+    """(count, iterator met JSON bytes) via de ORM, per product geserialiseerd"""
+    setup_django()
+    from django.db.models import Case, IntegerField, Q, When
+    from api.models import Product
+    from api.serializers import ProductSerializer
+    from api.services.catalog_fragments import render_fragment
+    from api.services.product_search import search_products
+
+    queryset = Product.objects.filter(is_active=True).order_by('name_nl', 'id')
+    if params['inactive']:
+        queryset = queryset.none()
+    if params['category']:
+        queryset = queryset.filter(category=params['category'])
+    if params['search']:
+        product_ids = search_products(params['search'])
+        if product_ids is None:
+            condition = Q()
+            for term in params['search'].split():
+                condition &= (
+                    Q(name_nl__icontains=term) | Q(short_description__icontains=term)
+                    | Q(description__icontains=term) | Q(features__icontains=term)
+                )
+            queryset = queryset.filter(condition)
+        else:
+            params['truncated'] = product_ids.truncated
+            queryset = queryset.filter(pk__in=product_ids)
+            if not params['ordering']:
+                queryset = queryset.order_by(Case(
+                    *[When(pk=pk, then=rank) for rank, pk in enumerate(product_ids)],
+                    output_field=IntegerField(),
+                ))
+    if params['ordering']:
+        queryset = queryset.order_by(*params['ordering'], 'id')
+
+    count = queryset.count()
+    start = (params['page'] - 1) * params['page_size']
+    products = queryset[start:start + params['page_size']]
+
+    def items():
+        for product in products.iterator(chunk_size=params['page_size']):
+            yield render_fragment(ProductSerializer(product, context={'request': request}).data)
+
+    return count, items()
+
+
+def stream_page(request, params, count, items, timings):
+    """Pagination envelope met de results array, product voor product gestreamd"""
+    next_page = params['page'] + 1 if params['page'] * params['page_size'] < count else None
+    previous_page = params['page'] - 1 if params['page'] > 1 else None
+    head = json.dumps({
+        'count': count,
+        'next': page_url(request, next_page),
+        'previous': page_url(request, previous_page),
+    })
+    yield head[:-1].encode('utf-8') + b',"results":['
+    for index, item in enumerate(items):
+        yield item if index == 0 else b',' + item
+    yield b']}'
+
+    timings['total'] = (time.perf_counter() - timings['started']) * 1000
+    logger.info(
+        f"Products handler: source={timings['source']} cold={timings['cold']} "
+        f"ttfb={timings['ttfb']:.1f}ms total={timings['total']:.1f}ms"
+    )
+
+
+def handler(request):
+    global _warm
+    from django.http import JsonResponse, StreamingHttpResponse
+
+    started = time.perf_counter()
+    cold = not _warm
+    _warm = True
+
+    if request.method != 'GET':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    params = parse_params(request)
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        source = 'snapshot'
+        count, items = snapshot_page(snapshot, params)
+    else:
+        source = 'database'
+        count, items = database_page(request, params)
+
+    timings = {
+        'started': started,
+        'source': source,
+        'cold': cold,
+        'ttfb': (time.perf_counter() - started) * 1000,
+    }
+    response = StreamingHttpResponse(
+        stream_page(request, params, count, items, timings),
+        content_type='application/json',
+    )
+
+    # Latency per request; bij een cold start ook de tijd sinds de module import
+    server_timing = [f"{source};dur={timings['ttfb']:.1f}"]
+    if cold:
+        server_timing.append(f"cold-start;dur={(started - _module_started) * 1000 + timings['ttfb']:.1f}")
+    response['Server-Timing'] = ', '.join(server_timing)
+    response['X-Cold-Start'] = '1' if cold else '0'
+    response['X-Catalog-Source'] = source
+    if params.get('truncated'):
+        from django.conf import settings
+        response['X-Search-Truncated'] = str(settings.PRODUCT_SEARCH_MAX_RESULTS)
+    if snapshot is not None and snapshot.generated_at:
+        response['X-Catalog-Snapshot'] = snapshot.generated_at
+    return response
@@ -1,11 +1,73 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from .services.cart import summarize_cart
+from .services.image_variants import get_variant_urls
 from .models import (
     Post, Comment, Product, Order, OrderItem,
     UserProfile, Address, ShoppingCart, CartItem  # ← TOEGEVOEGD: Checkout models
 )
 
+# Sparse fieldsets (?fields= / ?omit=) voor list payloads
+class SparseFieldsetsMixin:
+    """
+    Beperk de output tot ?fields=id,name_nl of laat velden weg met ?omit=description.
+
+    Werkt alleen op de top-level serializer van een request (niet genest).
+    `field_sources` koppelt berekende velden aan de model velden die ze nodig
+    hebben, zodat de queryset met .only() op dezelfde kolommen versmald wordt.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    field_sources = {}
+
+    @classmethod
+    def get_sparse_field_names(cls, query_params):
+        """Geselecteerde veldnamen, of None als er geen ?fields=/?omit= is opgegeven"""
+        requested = query_params.get(cls.fields_query_param, '')
+        omitted = query_params.get(cls.omit_query_param, '')
+        if not requested and not omitted:
+            return None
+
+        names = list(cls.Meta.fields)
+        if requested:
+            wanted = {name.strip() for name in requested.split(',') if name.strip()}
+            names = [name for name in names if name in wanted]
+        if omitted:
+            unwanted = {name.strip() for name in omitted.split(',') if name.strip()}
+            names = [name for name in names if name not in unwanted]
+        return names
+
+    @classmethod
+    def restrict_queryset(cls, queryset, query_params, required=()):
+        """Versmal de SQL kolommen met .only() tot wat de geselecteerde velden nodig hebben"""
+        names = cls.get_sparse_field_names(query_params)
+        if names is None:
+            return queryset
+
+        model_fields = {'id', *required}
+        for name in names:
+            model_fields.update(cls.field_sources.get(name, [name]))
+
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(*sorted(model_fields & concrete))
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        request = self.context.get('request')
+        is_top_level = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        if request is None or not is_top_level:
+            return fields
+
+        query_params = getattr(request, 'query_params', request.GET)
+        names = self.get_sparse_field_names(query_params)
+        if names is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in names}
+
 # User & Authentication Serializers
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -82,7 +144,7 @@ class PostSerializer(serializers.ModelSerializer):
         return obj.comments.count()
 
 # STAP 6: ENHANCED PRODUCT SERIALIZERS MET IMAGE SUPPORT
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     display_price = serializers.ReadOnlyField()
     price_excl_btw = serializers.ReadOnlyField()
     btw_amount = serializers.ReadOnlyField()
@@ -94,12 +156,27 @@ class ProductSerializer(serializers.ModelSerializer):
     
     # STAP 6: IMAGE SUPPORT - Full URL for frontend consumption
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()  # srcset map (thumbnail/card/detail/zoom)
+    
+    # Model velden die de berekende velden nodig hebben (voor .only())
+    field_sources = {
+        'display_price': ['price'],
+        'price_excl_btw': ['price'],
+        'btw_amount': ['price'],
+        'is_on_sale': ['price', 'original_price'],
+        'sale_percentage': ['price', 'original_price'],
+        'is_low_stock': ['stock', 'low_stock_threshold'],
+        'features_list': ['features'],
+        'absolute_url': ['id'],
+        'image_url': ['image'],
+        'image_variants': ['image', 'image_variants'],
+    }
     
     class Meta:
         model = Product
         fields = [
             'id', 'name_nl', 'description', 'short_description', 'features_list',
-            'image', 'image_url', 'price', 'display_price', 'original_price',
+            'image', 'image_url', 'image_variants', 'price', 'display_price', 'original_price',
             'price_excl_btw', 'btw_amount', 'is_on_sale', 'sale_percentage',
             'category', 'sku', 'stock', 'low_stock_threshold', 'is_low_stock',
             'is_active', 'is_featured', 'absolute_url', 'created_at', 'updated_at'
@@ -113,6 +190,10 @@ class ProductSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.image.url)
             return obj.image.url
         return None
+    
+    def get_image_variants(self, obj):
+        """Verkleinde WebP/JPEG varianten, None zolang ze nog niet gegenereerd zijn"""
+        return get_variant_urls(obj, self.context.get('request'))
 
 class ProductAdminSerializer(ProductSerializer):
     """Extended serializer voor admin gebruik"""
@@ -125,13 +206,14 @@ class ProductAdminSerializer(ProductSerializer):
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name_nl', read_only=True)
     product_image_url = serializers.SerializerMethodField()  # UPDATED: Using SerializerMethodField for full URL
+    product_image_variants = serializers.SerializerMethodField()
     unit_price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
     total_price = serializers.SerializerMethodField()
     
     class Meta:
         model = CartItem
         fields = [
-            'id', 'product', 'product_name', 'product_image_url',
+            'id', 'product', 'product_name', 'product_image_url', 'product_image_variants',
             'unit_price', 'quantity', 'total_price'
         ]
     
@@ -146,6 +228,9 @@ class CartItemSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.product.image.url)
             return obj.product.image.url
         return None
+    
+    def get_product_image_variants(self, obj):
+        return get_variant_urls(obj.product, self.context.get('request'))
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -161,17 +246,18 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             'tax_amount', 'total_with_tax', 'updated_at'
         ]
     
+    # Totalen in één doorloop; laad de wagen via services.cart.get_cart (items + producten geprefetcht)
     def get_total_items(self, obj):
-        return obj.get_total_items()
+        return summarize_cart(obj)['total_items']
     
     def get_subtotal(self, obj):
-        return obj.get_subtotal()
+        return summarize_cart(obj)['subtotal']
     
     def get_tax_amount(self, obj):
-        return obj.get_tax_amount()
+        return summarize_cart(obj)['tax_amount']
     
     def get_total_with_tax(self, obj):
-        return obj.get_total_with_tax()
+        return summarize_cart(obj)['total_with_tax']
 
 # Order Serializers - SINGLE CLEAN VERSION
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -186,10 +272,15 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'unit_price', 'quantity', 'total_price'
         ]
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display_nl', read_only=True)
     
+    field_sources = {
+        'status_display': ['status'],
+        'items': [],
+    }
+    
     class Meta:
         model = Order
         fields = [
@@ -0,0 +1,267 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+TAX_RATE = Decimal('0.21')  # Nederlandse BTW, zelfde als ShoppingCart.get_tax_amount
+MAX_BATCH_OPERATIONS = 100  # Operaties per POST /api/cart/batch/
+
+
+def with_cart_items(queryset):
+    """Laad de items met hun product in één extra query (gesorteerd op toevoegen)"""
+    from api.models import CartItem
+
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.select_related('product').order_by('id'))
+    )
+
+
+def get_cart(user, create=True):
+    """
+    Winkelwagen met items en producten: twee queries, ongeacht het aantal items.
+
+    Met create=False wordt None teruggegeven als de gebruiker nog geen wagen heeft.
+    """
+    from api.models import ShoppingCart
+
+    queryset = with_cart_items(ShoppingCart.objects.all())
+    if create:
+        cart, _ = queryset.get_or_create(user=user)
+        return cart
+    return queryset.filter(user=user).first()
+
+
+def summarize_cart(cart):
+    """
+    Alle totalen van een wagen in één doorloop over de (geprefetchte) items.
+
+    Het resultaat wordt op de wagen bewaard, zodat serializer velden en views
+    het niet opnieuw berekenen.
+    """
+    summary = getattr(cart, '_summary', None)
+    if summary is not None:
+        return summary
+
+    total_items = 0
+    subtotal = 0
+    for item in cart.items.all():
+        total_items += item.quantity
+        subtotal += item.get_total_price()
+
+    tax_amount = subtotal * TAX_RATE
+    summary = {
+        'total_items': total_items,
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'total_with_tax': subtotal + tax_amount,
+    }
+    cart._summary = summary
+    return summary
+
+
+def adjust_cart_totals(cart_id, quantity, amount):
+    """
+    Boek een verschil op de wagen tellers in één UPDATE met F() expressies.
+
+    Gelijktijdige wijzigingen tellen dus bij elkaar op in plaats van elkaar
+    te overschrijven. Raakt ook updated_at (laatste activiteit van de wagen).
+    """
+    from api.models import ShoppingCart
+
+    return ShoppingCart.objects.filter(pk=cart_id).update(
+        item_count=F('item_count') + quantity,
+        subtotal=F('subtotal') + Value(Decimal(amount), output_field=DecimalField(max_digits=10, decimal_places=2)),
+        updated_at=timezone.now(),
+    )
+
+
+def cart_totals_expressions(cart_item_model):
+    """Subqueries die item_count en subtotal van een wagen opnieuw optellen"""
+    items = cart_item_model.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    return {
+        'item_count': Coalesce(
+            Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        'subtotal': Coalesce(
+            Subquery(
+                items.annotate(total=Sum(F('quantity') * F('product__price'))).values('total'),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    }
+
+
+def recalculate_cart_totals(carts, **extra):
+    """Tel de tellers van `carts` (queryset) volledig opnieuw, in één UPDATE"""
+    from api.models import CartItem
+
+    return carts.update(**cart_totals_expressions(CartItem), **extra)
+
+
+def get_cart_summary(user):
+    """
+    Badge/summary data uit de tellers: één primary key lookup, geen items.
+
+    Zelfde velden als ShoppingCartSerializer (zonder de items).
+    """
+    from api.models import ShoppingCart
+
+    row = ShoppingCart.objects.filter(user=user).values('id', 'item_count', 'subtotal', 'updated_at').first()
+    if row is None:
+        row = {'id': None, 'item_count': 0, 'subtotal': Decimal('0.00'), 'updated_at': None}
+    tax_amount = row['subtotal'] * TAX_RATE
+    return {
+        'id': row['id'],
+        'total_items': row['item_count'],
+        'subtotal': row['subtotal'],
+        'tax_amount': tax_amount,
+        'total_with_tax': row['subtotal'] + tax_amount,
+        'updated_at': row['updated_at'],
+    }
+
+
+def upsert_cart_items(cart_id, quantities, replace=False, update_totals=True):
+    """
+    Tel aantallen op bij de items van een wagen in één INSERT ... ON CONFLICT.
+
+    `quantities` is {product_id: aantal}. Bestaande regels krijgen
+    quantity = quantity + aantal in de database zelf, dus gelijktijdige
+    "in winkelwagen" klikken gaan nooit verloren en raken de unique
+    constraint niet. Met replace=True wordt het aantal overschreven.
+
+    Signals worden overgeslagen; de wagen tellers worden hier met hetzelfde
+    verschil bijgewerkt (of, bij replace, volledig herteld).
+    """
+    from api.models import CartItem, Product, ShoppingCart
+
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    rows = [(cart_id, product_id, quantity, now, now) for product_id, quantity in sorted(quantities.items())]
+
+    quantity = 'excluded.quantity' if replace else f'{table}.quantity + excluded.quantity'
+
+    with transaction.atomic():
+        if connection.vendor in ('postgresql', 'sqlite'):
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (cart_id, product_id, quantity, created_at, updated_at)
+                    VALUES {values}
+                    ON CONFLICT (cart_id, product_id) DO UPDATE
+                    SET quantity = {quantity},
+                        updated_at = excluded.updated_at
+                    """,
+                    [value for row in rows for value in row],
+                )
+        else:
+            # Zonder ON CONFLICT: atomaire F() update, anders aanmaken
+            for product_id, amount in sorted(quantities.items()):
+                updated = CartItem.objects.filter(cart_id=cart_id, product_id=product_id).update(
+                    quantity=Value(amount) if replace else F('quantity') + amount,
+                    updated_at=timezone.now(),
+                )
+                if not updated:
+                    CartItem.objects.bulk_create([CartItem(cart_id=cart_id, product_id=product_id, quantity=amount)])
+
+        if not update_totals:
+            return
+        if replace:
+            recalculate_cart_totals(ShoppingCart.objects.filter(pk=cart_id), updated_at=timezone.now())
+            return
+        prices = dict(Product.objects.filter(pk__in=quantities).order_by().values_list('id', 'price'))
+        adjust_cart_totals(
+            cart_id,
+            sum(quantities.values()),
+            sum(prices[product_id] * quantity for product_id, quantity in quantities.items()),
+        )
+
+
+def delete_cart_items(cart_id, product_ids, update_totals=True):
+    """Verwijder items van een wagen in één DELETE (zonder per-item signals)"""
+    from api.models import CartItem, ShoppingCart
+
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE cart_id = %s AND product_id IN ({placeholders})",
+                [cart_id, *product_ids],
+            )
+            deleted = cursor.rowcount
+        if update_totals and deleted:
+            recalculate_cart_totals(ShoppingCart.objects.filter(pk=cart_id), updated_at=timezone.now())
+    return deleted
+
+
+def clear_cart(cart_id):
+    """Leeg een wagen: één DELETE van de items en de tellers op nul"""
+    from api.models import CartItem, ShoppingCart
+
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE cart_id = %s", [cart_id])
+            deleted = cursor.rowcount
+        ShoppingCart.objects.filter(pk=cart_id).update(
+            item_count=0, subtotal=Decimal('0.00'), updated_at=timezone.now(),
+        )
+    return deleted
+
+
+def collapse_cart_operations(operations):
+    """
+    Voeg operaties per product samen tot één eindresultaat, in volgorde.
+
+    `operations` is een lijst van (op, product_id, aantal) met op in
+    add/set/remove. Geeft (adds, sets, removes) terug: twee dicts
+    {product_id: aantal} en een set product ids.
+    """
+    state = {}
+    for op, product_id, quantity in operations:
+        current = state.get(product_id)
+        if op == 'remove' or (op == 'set' and quantity == 0):
+            state[product_id] = ('remove', 0)
+        elif op == 'set':
+            state[product_id] = ('set', quantity)
+        elif current is None:
+            state[product_id] = ('add', quantity)
+        elif current[0] == 'remove':
+            state[product_id] = ('set', quantity)
+        else:
+            state[product_id] = (current[0], current[1] + quantity)
+
+    adds = {product_id: quantity for product_id, (op, quantity) in state.items() if op == 'add'}
+    sets = {product_id: quantity for product_id, (op, quantity) in state.items() if op == 'set'}
+    removes = {product_id for product_id, (op, _) in state.items() if op == 'remove'}
+    return adds, sets, removes
+
+
+def apply_cart_operations(cart_id, operations):
+    """
+    Voer een batch add/set/remove operaties uit in één transactie.
+
+    Maximaal één upsert per soort en één DELETE, daarna worden de wagen
+    tellers één keer herteld.
+    """
+    from api.models import ShoppingCart
+
+    adds, sets, removes = collapse_cart_operations(operations)
+    with transaction.atomic():
+        upsert_cart_items(cart_id, adds, update_totals=False)
+        upsert_cart_items(cart_id, sets, replace=True, update_totals=False)
+        delete_cart_items(cart_id, removes, update_totals=False)
+        recalculate_cart_totals(ShoppingCart.objects.filter(pk=cart_id), updated_at=timezone.now())
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# Gezet als een response met verouderde data (bijv. de vorige statistieken) is opgebouwd
+_skip_response_cache = ContextVar('catalog_skip_response_cache', default=False)
+
+
+def get_catalog_cache():
+    """Cache backend voor de productcatalogus (gedeeld tussen workers in productie)"""
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def is_shared_cache(cache=None):
+    """Gedeeld tussen workers (Redis/Memcached/database) of alleen dit proces (LocMem/Dummy)"""
+    from django.core.cache.backends.dummy import DummyCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    cache = get_catalog_cache() if cache is None else cache
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def get_cache_timeout(setting, default):
+    """
+    Timeout uit `setting`, begrensd op LOCAL_CACHE_MAX_TIMEOUT zonder gedeelde cache.
+
+    Lange timeouts leunen op versie bumps die elke worker zien; met een
+    per-proces cache ziet alleen de schrijvende worker de bump.
+    """
+    timeout = getattr(settings, setting, default)
+    if timeout is not None and is_shared_cache():
+        return timeout
+    local_timeout = getattr(settings, 'LOCAL_CACHE_MAX_TIMEOUT', 300)
+    return local_timeout if timeout is None else min(timeout, local_timeout)
+
+
+def get_catalog_version():
+    """
+    Huidige catalogus versie.
+
+    De versie start op een tijdstempel in milliseconden zodat een verloren
+    (ge-evicte) versie sleutel nooit terugvalt op een oude versie waarvoor
+    nog entries in de cache staan.
+    """
+    cache = get_catalog_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Verhoog de catalogus versie - alle gecachte product responses worden ongeldig"""
+    cache = get_catalog_cache()
+    try:
+        version = cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Sleutel bestaat (nog) niet: initialiseer op een nieuwe tijdstempel
+        version = int(time.time() * 1000)
+        cache.set(CATALOG_VERSION_KEY, version, None)
+    logger.info(f"Catalog cache version bumped to {version}")
+    return version
+
+
+def get_catalog_last_modified(version=None):
+    """
+    Laatste updated_at van de actieve catalogus, één keer per catalogus versie.
+
+    De MAX loopt over de partial index product_active_updated_idx; daarna komt
+    hij uit de cache tot de volgende product write de versie verhoogt.
+    """
+    from django.db.models import Max
+    from api.models import Product
+
+    if version is None:
+        version = get_catalog_version()
+    cache = get_catalog_cache()
+    cache_key = f"catalog:last_modified:v{version}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached or None
+
+    last_modified = Product.objects.filter(is_active=True).aggregate(last=Max('updated_at'))['last']
+    cache.set(cache_key, last_modified or '', get_cache_timeout('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7))
+    return last_modified
+
+
+def skip_response_cache():
+    """De response die nu opgebouwd wordt niet cachen (hij bevat verouderde data)"""
+    _skip_response_cache.set(True)
+
+
+def build_catalog_cache_key(request, version=None, extra=''):
+    """
+    Cache key voor een catalogus response.
+
+    Bevat de catalogus versie, de absolute URL met gesorteerde query parameters
+    (filter/search/ordering/page) en de headers waarop de response varieert.
+    `extra` kan data validators (zoals een ETag) toevoegen.
+    """
+    if version is None:
+        version = get_catalog_version()
+
+    params = sorted(
+        (key, value)
+        for key in request.GET
+        for value in request.GET.getlist(key)
+    )
+    url = request.build_absolute_uri(request.path)
+    parts = [
+        request.method,
+        url,
+        repr(params),
+        request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+        request.META.get('HTTP_ACCEPT', ''),
+        extra,
+    ]
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return f"catalog:v{version}:{digest}"
+
+
+def get_or_set_catalog_response(request, build_response, timeout=None, extra=''):
+    """
+    Geef de gecachte response voor deze request terug, of bouw en cache hem.
+
+    Alleen succesvolle GET/HEAD responses worden gecached. DRF responses worden
+    pas na het renderen opgeslagen.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return build_response()
+
+    if timeout is None:
+        timeout = get_cache_timeout('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+
+    cache = get_catalog_cache()
+    cache_key = build_catalog_cache_key(request, extra=extra)
+
+    response = cache.get(cache_key)
+    if response is not None:
+        response['X-Cache-Status'] = 'HIT'
+        return response
+
+    token = _skip_response_cache.set(False)
+    try:
+        response = build_response()
+        stale = _skip_response_cache.get()
+    finally:
+        _skip_response_cache.reset(token)
+    response['X-Cache-Status'] = 'MISS'
+
+    if stale:
+        # Alleen dit request; de volgende na de rebuild wordt wel gecached
+        response.catalog_stale = True
+    elif response.status_code == 200 and not response.streaming:
+        if hasattr(response, 'render') and callable(response.render):
+            response.add_post_render_callback(
+                lambda r: cache.set(cache_key, r, timeout)
+            )
+        else:
+            cache.set(cache_key, response, timeout)
+
+    return response
+
+
+def catalog_cache_page(timeout=None):
+    """
+    Decorator variant van cache_page die op de catalogus versie is gekeyed.
+
+    Entries kunnen dagen leven: elke product wijziging verhoogt de versie,
+    waardoor oude entries nooit meer geraakt worden.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            return get_or_set_catalog_response(
+                request,
+                lambda: view_func(request, *args, **kwargs),
+                timeout=timeout,
+            )
+        return _wrapped_view
+    return decorator
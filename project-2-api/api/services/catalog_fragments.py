@@ -0,0 +1,74 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from .catalog_cache import get_catalog_cache
+
+logger = logging.getLogger(__name__)
+
+
+def get_fragment_variant(request, field_names=None):
+    """
+    Variant sleutel voor fragmenten.
+
+    De geserialiseerde JSON hangt af van de host (absolute image URLs) en van
+    de geselecteerde velden (?fields= / ?omit=).
+    """
+    base_url = request.build_absolute_uri('/')
+    fields = ','.join(field_names) if field_names is not None else '*'
+    return hashlib.md5(f"{base_url}|{fields}".encode('utf-8')).hexdigest()[:16]
+
+
+def build_fragment_key(variant, product):
+    """Fragment key per product; updated_at zorgt dat een wijziging een nieuw fragment geeft"""
+    return f"catalog:fragment:{variant}:{product.pk}:{product.updated_at.isoformat()}"
+
+
+def render_fragment(data):
+    """Render één geserialiseerd product naar JSON bytes (zelfde encoder als de API)"""
+    return JSONRenderer().render(data)
+
+
+def get_product_fragments(products, variant, render_missing):
+    """
+    JSON fragmenten voor `products` (met pk en updated_at geladen), in volgorde.
+
+    `render_missing(product_ids)` serialiseert alleen de producten zonder
+    fragment in de cache en geeft een dict {product_id: bytes} terug.
+    """
+    cache = get_catalog_cache()
+    keys = {product.pk: build_fragment_key(variant, product) for product in products}
+
+    fragments = cache.get_many(list(keys.values()))
+    missing = [pk for pk, key in keys.items() if key not in fragments]
+
+    if missing:
+        rendered = render_missing(missing)
+        new_fragments = {keys[pk]: fragment for pk, fragment in rendered.items() if pk in keys}
+        timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+        cache.set_many(new_fragments, timeout)
+        fragments.update(new_fragments)
+        logger.debug(f"Rendered {len(new_fragments)} product fragments ({len(products) - len(missing)} cached)")
+
+    # Producten die tussendoor verwijderd zijn hebben geen fragment
+    return [fragments[keys[product.pk]] for product in products if keys[product.pk] in fragments]
+
+
+def join_fragments(fragments):
+    """JSON array van fragmenten zonder opnieuw te serialiseren"""
+    return b'[' + b','.join(fragments) + b']'
+
+
+def render_paginated_body(envelope, fragments):
+    """
+    Pagination envelope (count/next/previous) met de fragmenten als 'results'.
+
+    'results' staat in de DRF envelopes altijd als laatste sleutel.
+    """
+    head = JSONRenderer().render({key: value for key, value in envelope.items() if key != 'results'})
+    results = b'"results":' + join_fragments(fragments)
+    if head == b'{}':
+        return b'{' + results + b'}'
+    return head[:-1] + b',' + results + b'}'
@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Value, When
+
+from .catalog_cache import get_cache_timeout, get_catalog_cache, get_catalog_version, skip_response_cache
+
+logger = logging.getLogger(__name__)
+
+# Dimensies van de voorberekende tellingen (een kubus: één cel per combinatie).
+# Filterset velden van ProductViewSet moeten hier in staan om zonder COUNT te tellen.
+STATS_DIMENSIONS = ('category', 'on_sale', 'in_stock', 'price_bucket')
+
+# Laatst opgebouwde tellingen (van welke versie dan ook): geserveerd tijdens een rebuild
+LATEST_STATS_KEY = 'catalog:stats:latest'
+
+_executor = None
+_refresh_lock = threading.Lock()
+_refresh_pending = False
+
+
+def get_price_buckets():
+    """Grenzen van de prijs buckets in EUR (incl. BTW), oplopend"""
+    return tuple(getattr(settings, 'CATALOG_PRICE_BUCKETS', (10, 25, 50, 100)))
+
+
+def get_price_bucket_ranges(buckets=None):
+    """[(min, max), ...] per bucket index; max None betekent geen bovengrens"""
+    buckets = get_price_buckets() if buckets is None else buckets
+    bounds = [0, *buckets, None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def annotate_stats_dimensions(queryset, buckets=None):
+    """Voeg on_sale, in_stock en price_bucket toe als SQL expressies"""
+    buckets = get_price_buckets() if buckets is None else buckets
+    price_bucket = Case(
+        *[When(price__lt=limit, then=Value(index)) for index, limit in enumerate(buckets)],
+        default=Value(len(buckets)),
+        output_field=IntegerField(),
+    )
+    return queryset.annotate(
+        on_sale=Case(
+            When(original_price__gt=F('price'), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        in_stock=Case(
+            When(stock__gt=0, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        price_bucket=price_bucket,
+    )
+
+
+def build_catalog_stats(queryset=None):
+    """
+    Bereken de product tellingen met één GROUP BY query.
+
+    Resultaat bevat het totaal, de telling per categorie en de ruwe cellen
+    per combinatie van STATS_DIMENSIONS waaruit elke filter combinatie en
+    elke facet afgeleid kan worden. Standaard over alle actieve producten.
+    """
+    from api.models import Product
+
+    if queryset is None:
+        queryset = Product.objects.filter(is_active=True)
+
+    buckets = get_price_buckets()
+    rows = (
+        annotate_stats_dimensions(queryset.order_by(), buckets)
+        .values(*STATS_DIMENSIONS)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    cells = {
+        tuple(row[dimension] for dimension in STATS_DIMENSIONS): row['count']
+        for row in rows
+    }
+
+    per_category = {}
+    category_index = STATS_DIMENSIONS.index('category')
+    for cell, count in cells.items():
+        category = cell[category_index]
+        per_category[category] = per_category.get(category, 0) + count
+
+    return {
+        'total': sum(cells.values()),
+        'per_category': per_category,
+        'cells': cells,
+        'price_buckets': buckets,
+    }
+
+
+def store_catalog_stats(version):
+    """Bouw de tellingen (één GROUP BY) en sla ze op voor `version` en als laatste stand"""
+    stats = build_catalog_stats()
+    cache = get_catalog_cache()
+    timeout = get_cache_timeout('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+    cache.set_many({f"catalog:stats:v{version}": stats, LATEST_STATS_KEY: stats}, timeout)
+    logger.info(f"Catalog stats rebuilt: {stats['total']} active products")
+    return stats
+
+
+def get_catalog_stats(allow_stale=True):
+    """
+    Catalogus statistieken voor de huidige catalogus versie.
+
+    Elke product wijziging verhoogt de versie; de rebuild loopt daarna op de
+    achtergrond. Tot hij klaar is krijgt een request de vorige tellingen
+    (stale-while-revalidate) en wordt die response niet gecached. Alleen
+    zonder vorige tellingen (koude cache) draait de GROUP BY in het request.
+    """
+    cache = get_catalog_cache()
+    version = get_catalog_version()
+    buckets = get_price_buckets()
+
+    stats = cache.get(f"catalog:stats:v{version}")
+    if stats is not None and stats.get('price_buckets') == buckets:
+        return stats
+
+    if allow_stale:
+        latest = cache.get(LATEST_STATS_KEY)
+        if latest is not None and latest.get('price_buckets') == buckets:
+            skip_response_cache()
+            schedule_catalog_stats_refresh()
+            return latest
+    return store_catalog_stats(version)
+
+
+def refresh_catalog_stats():
+    """Bouw de tellingen voor de huidige versie op, zodat geen request de GROUP BY betaalt"""
+    try:
+        get_catalog_stats(allow_stale=False)
+    except Exception as e:
+        logger.error(f"Catalog stats refresh failed: {str(e)}")
+
+
+def get_refresh_delay():
+    # Writes binnen dit aantal seconden delen één rebuild
+    return getattr(settings, 'CATALOG_STATS_REFRESH_DELAY', 2)
+
+
+def _refresh_in_worker():
+    global _refresh_pending
+    time.sleep(get_refresh_delay())
+    with _refresh_lock:
+        # Writes tijdens de rebuild plannen er weer een nieuwe
+        _refresh_pending = False
+    close_old_connections()
+    try:
+        refresh_catalog_stats()
+    finally:
+        close_old_connections()
+
+
+def schedule_catalog_stats_refresh():
+    """
+    Plan een rebuild van de tellingen in een achtergrond thread (na een product write).
+
+    Het request betaalt de GROUP BY niet, en een reeks writes (import,
+    admin bulk acties) geeft één rebuild in plaats van één per product.
+    """
+    global _executor, _refresh_pending
+    with _refresh_lock:
+        if _refresh_pending:
+            return
+        _refresh_pending = True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-stats')
+    _executor.submit(_refresh_in_worker)
+
+
+def sum_cells(cells, filters):
+    """Som van de cellen die aan alle filters (dimensie -> waarde) voldoen"""
+    positions = [(STATS_DIMENSIONS.index(name), value) for name, value in filters.items()]
+    return sum(
+        count for cell, count in cells.items()
+        if all(cell[index] == value for index, value in positions)
+    )
+
+
+def count_active_products(filters=None):
+    """
+    Aantal actieve producten voor een filterset combinatie.
+
+    `filters` bevat de opgeschoonde filterset waarden (lege waarden weggelaten).
+    Geeft None terug als de combinatie niet uit de statistieken af te leiden is.
+    """
+    filters = dict(filters or {})
+
+    # De catalogus bevat alleen actieve producten
+    is_active = filters.pop('is_active', None)
+    if is_active is False:
+        return 0
+
+    if set(filters) - set(STATS_DIMENSIONS):
+        return None
+
+    stats = get_catalog_stats()
+    if not filters:
+        return stats['total']
+    if set(filters) == {'category'}:
+        return stats['per_category'].get(filters['category'], 0)
+    return sum_cells(stats['cells'], filters)
+
+
+def build_facets(stats, filters=None):
+    """
+    Facet tellingen voor de webshop filters.
+
+    Elke facet telt met alle filters behalve die van zichzelf, zodat de
+    categorie lijst ook na het kiezen van een categorie alle opties toont.
+    """
+    from api.models import Product
+
+    filters = dict(filters or {})
+    cells = stats['cells']
+
+    def count(exclude=None, **extra):
+        active = {name: value for name, value in filters.items() if name != exclude}
+        active.update(extra)
+        return sum_cells(cells, active)
+
+    categories = [
+        {'value': value, 'label': label, 'count': count(exclude='category', category=value)}
+        for value, label in Product.CATEGORY_CHOICES
+    ]
+
+    price_buckets = []
+    for index, (minimum, maximum) in enumerate(get_price_bucket_ranges(stats['price_buckets'])):
+        price_buckets.append({
+            'key': f"{minimum}-{maximum}" if maximum is not None else f"{minimum}+",
+            'min': minimum,
+            'max': maximum,
+            'count': count(exclude='price_bucket', price_bucket=index),
+        })
+
+    return {
+        'total': count(),
+        'categories': categories,
+        'on_sale': count(exclude='on_sale', on_sale=True),
+        'in_stock': count(exclude='in_stock', in_stock=True),
+        'price_buckets': price_buckets,
+    }
@@ -0,0 +1,110 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from .cart import clear_cart
+from .inventory import InsufficientStock, reserve_stock
+from .order_numbers import allocate_order_number
+
+SHIPPING_COST = Decimal('4.95')  # Nederlandse verzendkosten
+
+
+def build_order_items(cart_items):
+    """Ongesavede OrderItems met product snapshot uit de (al geladen) cart items"""
+    from api.models import OrderItem
+
+    order_items = []
+    for cart_item in cart_items:
+        product = cart_item.product
+        order_items.append(OrderItem(
+            product=product,
+            product_name=product.name_nl,
+            product_sku=product.sku or '',
+            unit_price=product.price,
+            quantity=cart_item.quantity,
+            total_price=product.price * cart_item.quantity,
+        ))
+    return order_items
+
+
+def precheck_cart(user):
+    """
+    Snelle check vóór het ordernummer: wagen niet leeg en genoeg voorraad (één query, zonder locks).
+
+    Geeft {product_id: aantal} terug, of None als de wagen leeg is; bij een
+    tekort gaat InsufficientStock omhoog. De gelockte check in de transactie
+    blijft de echte controle.
+    """
+    from api.models import CartItem
+
+    rows = list(
+        CartItem.objects.filter(cart__user=user)
+        .values_list('product_id', 'quantity', 'product__stock', 'product__is_active')
+    )
+    if not rows:
+        return None
+    shortages = {
+        product_id: (quantity, stock if is_active else 0)
+        for product_id, quantity, stock, is_active in rows
+        if not is_active or stock < quantity
+    }
+    if shortages:
+        raise InsufficientStock(shortages)
+    return {product_id: quantity for product_id, quantity, _, _ in rows}
+
+
+def place_order(user, shipping_address, billing_address, **fields):
+    """
+    Zet de winkelwagen van `user` om in een bestelling, in één transactie.
+
+    Vast aantal queries, ongeacht het aantal regels: een snelle check van de
+    wagen (vóór het ordernummer), één gelockte read van de wagen met items en
+    producten, één INSERT van de order (totalen en ordernummer al bepaald), de
+    voorraad reservering, één bulk_create van de regels en het legen van de wagen.
+    Geeft (order, order_items) terug, of None als de wagen leeg is.
+    """
+    from api.models import CartItem, Order, OrderItem
+
+    # Lege wagen of tekort: geen ordernummer verbruiken
+    if precheck_cart(user) is None:
+        return None
+
+    # Buiten de transactie: de teller rij is maar even gelockt; alleen een
+    # checkout die daarna nog mislukt (gelijktijdige koper) laat een gat
+    order_number = allocate_order_number()
+
+    with transaction.atomic():
+        cart_items = list(
+            CartItem.objects.select_for_update(of=('self', 'cart'))
+            .filter(cart__user=user)
+            .select_related('cart', 'product')
+            .order_by('id')
+        )
+        if not cart_items:
+            return None
+
+        order_items = build_order_items(cart_items)
+        order = Order(
+            order_number=order_number,
+            user=user,
+            shipping_address=shipping_address,
+            billing_address=billing_address,
+            shipping_cost=SHIPPING_COST,
+            **fields,
+        )
+        order.calculate_totals(order_items)
+        order.save()
+
+        # Voorraad afboeken; bij een tekort (InsufficientStock) rolt alles terug
+        reserve_stock(
+            order,
+            {cart_item.product_id: cart_item.quantity for cart_item in cart_items},
+            commit=order.payment_status == 'paid',
+        )
+
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        clear_cart(cart_items[0].cart_id)
+    return order, order_items
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def build_etag(request, *validators):
+    """
+    Sterke ETag voor een request en de data validators (bijv. max updated_at).
+
+    Path, query parameters en Accept headers zitten erin zodat elke
+    representatie (filter, pagina, ?fields=, JSON/HTML) een eigen ETag heeft.
+    """
+    params = sorted(
+        (key, value)
+        for key in request.GET
+        for value in request.GET.getlist(key)
+    )
+    parts = [
+        request.path,
+        repr(params),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+        *[str(validator) for validator in validators],
+    ]
+    return '"%s"' % hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """
+    304 response als If-None-Match / If-Modified-Since nog geldig is, anders None.
+
+    `last_modified` is een datetime (of None).
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    """Zet ETag en Last-Modified headers op een response"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
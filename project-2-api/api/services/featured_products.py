@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .catalog_cache import get_cache_timeout, get_catalog_cache, is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+FEATURED_VERSION_KEY = 'catalog:featured:version'
+
+# Payloads van dit proces: {(versie, variant): JSON bytes}, alleen de laatste versie.
+# Alleen met een gedeelde cache: anders ziet dit proces de versie bumps van andere workers niet
+_payloads = {}
+_payloads_lock = threading.Lock()
+
+
+def get_featured_version():
+    """
+    Versie van de featured selectie.
+
+    Staat los van de catalogus versie: alleen wijzigingen aan featured of
+    actieve producten maken de homepage payload ongeldig.
+    """
+    cache = get_catalog_cache()
+    version = cache.get(FEATURED_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(FEATURED_VERSION_KEY, version, None):
+            version = cache.get(FEATURED_VERSION_KEY, version)
+    return version
+
+
+def bump_featured_version():
+    """Verhoog de featured versie - elk proces bouwt de payload één keer opnieuw op"""
+    cache = get_catalog_cache()
+    try:
+        version = cache.incr(FEATURED_VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(FEATURED_VERSION_KEY, version, None)
+    logger.info(f"Featured products version bumped to {version}")
+    return version
+
+
+def get_featured_queryset():
+    """Actieve featured producten in Meta.ordering volgorde, maximaal FEATURED_PRODUCTS_COUNT"""
+    from api.models import Product
+
+    limit = getattr(settings, 'FEATURED_PRODUCTS_COUNT', 8)
+    return (
+        Product.objects.filter(is_active=True, is_featured=True)
+        .order_by(*Product._meta.ordering, 'id')[:limit]
+    )
+
+
+def get_featured_payload(variant, build_payload):
+    """
+    JSON payload van de featured producten.
+
+    Volgorde van opzoeken: geheugen van dit proces (alleen met een gedeelde
+    cache), de cache, en pas daarna `build_payload()` (de enige stap die de database raakt). Geeft
+    (versie, bytes) terug.
+    """
+    version = get_featured_version()
+    key = (version, variant)
+    use_process_memory = is_shared_cache()
+
+    payload = _payloads.get(key) if use_process_memory else None
+    if payload is not None:
+        return version, payload
+
+    cache = get_catalog_cache()
+    cache_key = f"catalog:featured:v{version}:{variant}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = build_payload()
+        timeout = get_cache_timeout('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+        cache.set(cache_key, payload, timeout)
+        logger.info(f"Featured products payload rebuilt for version {version}")
+
+    if not use_process_memory:
+        return version, payload
+    with _payloads_lock:
+        for stale_key in [k for k in _payloads if k[0] != version]:
+            del _payloads[stale_key]
+        _payloads[key] = payload
+    return version, payload
@@ -0,0 +1,125 @@
+import logging
+
+from django.conf import settings
+from django.core import signing
+
+from .cart import TAX_RATE, collapse_cart_operations, upsert_cart_items
+
+logger = logging.getLogger(__name__)
+
+GUEST_CART_SALT = 'api.guest_cart'
+MAX_GUEST_CART_PRODUCTS = 50  # Houdt de cookie ruim onder de 4KB
+
+
+def get_cookie_name():
+    return getattr(settings, 'GUEST_CART_COOKIE_NAME', 'hc_guest_cart')
+
+
+def get_max_age():
+    return getattr(settings, 'GUEST_CART_MAX_AGE', 60 * 60 * 24 * 30)
+
+
+def get_samesite(request):
+    # De frontend draait op een ander domein: cross-site cookies moeten Secure zijn
+    return 'None' if request.is_secure() else 'Lax'
+
+
+def read_guest_cart(request):
+    """
+    Gast winkelwagen uit de signed cookie: {product_id: aantal}.
+
+    Een ontbrekende, verlopen of gemanipuleerde cookie geeft een lege wagen.
+    """
+    value = request.COOKIES.get(get_cookie_name())
+    if not value:
+        return {}
+    try:
+        data = signing.loads(value, salt=GUEST_CART_SALT, max_age=get_max_age())
+        return {int(product_id): int(quantity) for product_id, quantity in data.items() if int(quantity) > 0}
+    except (signing.BadSignature, ValueError, TypeError, AttributeError):
+        return {}
+
+
+def write_guest_cart(request, response, items):
+    """Schrijf de gast wagen naar de cookie (of verwijder hem als hij leeg is)"""
+    if not items:
+        response.delete_cookie(get_cookie_name(), samesite=get_samesite(request))
+        return response
+
+    value = signing.dumps(
+        {str(product_id): quantity for product_id, quantity in sorted(items.items())},
+        salt=GUEST_CART_SALT,
+        compress=True,
+    )
+    response.set_cookie(
+        get_cookie_name(),
+        value,
+        max_age=get_max_age(),
+        httponly=True,
+        secure=request.is_secure(),
+        samesite=get_samesite(request),
+    )
+    return response
+
+
+def apply_guest_operations(items, operations):
+    """Pas add/set/remove operaties toe op een gast wagen (zonder database writes)"""
+    adds, sets, removes = collapse_cart_operations(operations)
+    items = dict(items)
+    for product_id in removes:
+        items.pop(product_id, None)
+    items.update(sets)
+    for product_id, quantity in adds.items():
+        items[product_id] = items.get(product_id, 0) + quantity
+    return items
+
+
+def build_guest_cart(items, products):
+    """
+    Wagen data in de vorm van ShoppingCartSerializer, uit de cookie en één product query.
+
+    `products` is {product_id: Product} (in_bulk); onbekende of inactieve
+    producten vallen weg.
+    """
+    from api.models import CartItem
+
+    cart_items = [
+        CartItem(product=products[product_id], quantity=quantity)
+        for product_id, quantity in items.items()
+        if product_id in products
+    ]
+    total_items = sum(item.quantity for item in cart_items)
+    subtotal = sum(item.get_total_price() for item in cart_items)
+    tax_amount = subtotal * TAX_RATE
+    return cart_items, {
+        'id': None,
+        'total_items': total_items,
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'total_with_tax': subtotal + tax_amount,
+        'updated_at': None,
+        'guest': True,
+    }
+
+
+def merge_guest_cart(request, response, user):
+    """
+    Voeg de gast wagen samen met de wagen van de gebruiker (bij login/registratie).
+
+    Eén bulk upsert (aantallen worden opgeteld), daarna wordt de cookie gewist.
+    """
+    from api.models import Product, ShoppingCart
+
+    items = read_guest_cart(request)
+    if not items:
+        return response
+
+    active = set(Product.objects.filter(pk__in=items, is_active=True).order_by().values_list('id', flat=True))
+    items = {product_id: quantity for product_id, quantity in items.items() if product_id in active}
+    if items:
+        cart, _ = ShoppingCart.objects.get_or_create(user=user)
+        upsert_cart_items(cart.pk, items)
+        logger.info(f"Merged guest cart ({len(items)} products) into cart of user {user.pk}")
+
+    response.delete_cookie(get_cookie_name(), samesite=get_samesite(request))
+    return response
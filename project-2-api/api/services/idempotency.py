@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1  # Seconden tussen twee checks op een lopend request
+
+
+def get_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def get_wait_timeout():
+    # Zo lang wacht een dubbel request op het lopende eerste request (bezet zolang een worker)
+    return getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 3)
+
+
+def get_lock_timeout():
+    # Een request dat langer "loopt" is waarschijnlijk gecrasht; de sleutel mag opnieuw
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60))
+
+
+def hash_request(request):
+    """Vingerafdruk van de body: dezelfde sleutel met een andere body is een client fout"""
+    payload = json.dumps(request.data, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def replay(record):
+    response = HttpResponse(
+        bytes(record.response_body or b''),
+        status=record.response_status,
+        content_type=record.response_content_type or 'application/json',
+    )
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def claim_key(user, scope, key, request_hash):
+    """
+    Leg de sleutel vast voor dit request; geeft (record, aangemaakt).
+
+    De INSERT commit meteen (eigen transactie), zodat gelijktijdige dubbele
+    requests de lopende sleutel zien. Verlopen of achtergelaten sleutels
+    worden overgenomen.
+    """
+    from api.models import IdempotencyKey
+
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, scope=scope, key=key, request_hash=request_hash, expires_at=now + get_ttl(),
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+            if record is None:
+                continue
+            abandoned = record.response_status is None and record.created_at < now - get_lock_timeout()
+            if record.expires_at > now and not abandoned:
+                return record, False
+            IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+    return record, False
+
+
+def wait_for_response(record):
+    """Wacht (pollend) tot het eerste request zijn response heeft opgeslagen"""
+    from api.models import IdempotencyKey
+
+    deadline = time.monotonic() + get_wait_timeout()
+    while record is not None and record.response_status is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def idempotent(view):
+    """
+    Idempotency-Key support voor een DRF function view (onder @api_view/@permission_classes).
+
+    De eerste response op een sleutel wordt opgeslagen en bij herhalingen
+    byte voor byte teruggegeven (met Idempotent-Replayed: true). Een dubbel
+    request dat binnenkomt terwijl het eerste nog loopt wacht daarop in plaats
+    van de view nog eens uit te voeren. Zonder header, of bij GET, verandert er niets.
+    Server fouten (5xx) worden niet bewaard: de client mag het opnieuw proberen.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        from api.models import IdempotencyKey
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method in ('GET', 'HEAD', 'OPTIONS') or not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'error': f'{IDEMPOTENCY_HEADER} mag maximaal {MAX_KEY_LENGTH} tekens zijn'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = f"{request.method} {request.path}"
+        request_hash = hash_request(request)
+        record, created = claim_key(request.user, scope, key, request_hash)
+
+        if not created:
+            if record is not None and record.request_hash != request_hash:
+                return Response({
+                    'error': f'{IDEMPOTENCY_HEADER} is al gebruikt voor een ander request'
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            record = wait_for_response(record)
+            if record is None or record.response_status is None:
+                # Eerste request mislukt of nog bezig: de client probeert het later opnieuw
+                response = Response({
+                    'error': 'Dit request wordt nog verwerkt'
+                }, status=status.HTTP_409_CONFLICT)
+                response['Retry-After'] = '1'
+                return response
+            return replay(record)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        # Zelf renderen (JSON), zodat de eerste response en herhalingen identiek zijn
+        if isinstance(response, Response):
+            body = JSONRenderer().render(response.data)
+            content_type = 'application/json'
+        else:
+            body = response.content
+            content_type = response.get('Content-Type', 'application/json')
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            response_status=response.status_code,
+            response_content_type=content_type,
+            response_body=body,
+        )
+        logger.info(f"Stored idempotent response for {scope} ({response.status_code})")
+
+        stored = HttpResponse(body, status=response.status_code, content_type=content_type)
+        for header in ('Retry-After', 'Location'):
+            if response.has_header(header):
+                stored[header] = response[header]
+        return stored
+
+    return wrapper
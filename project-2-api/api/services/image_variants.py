@@ -0,0 +1,172 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Formaat -> (extensie, Pillow save opties)
+VARIANT_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_variant_sizes():
+    """Variant naam -> maximale breedte in pixels"""
+    return getattr(settings, 'PRODUCT_IMAGE_VARIANTS', {
+        'thumbnail': 150,
+        'card': 400,
+        'detail': 800,
+        'zoom': 1600,
+    })
+
+
+def get_executor():
+    """Gedeelde worker pool voor variant generatie (buiten het request pad)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2),
+                thread_name_prefix='image-variants',
+            )
+    return _executor
+
+
+def build_variant_name(image_name, variant, extension):
+    """
+    products/foto.jpg -> products/foto__card.webp (naast het origineel).
+
+    Dit is de gevraagde naam; de ContentAddressedStorage van Product.image
+    bewaart de variant als products/<sha256>.webp. Gebruik daarom altijd de
+    naam die storage.save() teruggeeft (opgeslagen in Product.image_variants).
+    """
+    root, _ = os.path.splitext(image_name)
+    return f"{root}__{variant}.{extension}"
+
+
+def render_variant(image, width, format_name):
+    """Verklein (nooit vergroten) en encodeer één variant, geeft (bytes, breedte, hoogte)"""
+    from PIL import Image
+
+    variant = image.copy()
+    if variant.width > width:
+        height = max(1, round(variant.height * width / variant.width))
+        variant = variant.resize((width, height), Image.LANCZOS)
+
+    _, save_options = VARIANT_FORMATS[format_name]
+    if save_options['format'] == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+
+    buffer = io.BytesIO()
+    variant.save(buffer, **save_options)
+    return buffer.getvalue(), variant.width, variant.height
+
+
+def generate_variants(product_id, force=False):
+    """
+    Genereer alle varianten voor de afbeelding van een product.
+
+    Slaat de bestandsnamen op in Product.image_variants (met de bron afbeelding,
+    zodat een nieuwe upload opnieuw genereert); de Product signals maken de
+    caches ongeldig. Geeft de varianten dict terug, of None als er niets te doen was.
+    """
+    from PIL import Image, ImageOps
+    from api.models import Product
+
+    product = Product.objects.filter(pk=product_id).only('id', 'image', 'image_variants').first()
+    if product is None or not product.image:
+        return None
+
+    image_name = product.image.name
+    if not force and product.image_variants.get('source') == image_name:
+        return None
+
+    storage = product.image.storage
+    with storage.open(image_name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    variants = {'source': image_name, 'sizes': {}}
+    for variant, width in get_variant_sizes().items():
+        entry = {}
+        for format_name, (extension, _) in VARIANT_FORMATS.items():
+            content, entry['width'], entry['height'] = render_variant(original, width, format_name)
+            # Zelfde inhoud geeft dezelfde naam: een ongewijzigde variant wordt
+            # niet opnieuw weggeschreven, en oude varianten kunnen gedeeld zijn
+            # met andere producten, dus hier wordt niets verwijderd
+            name = build_variant_name(image_name, variant, extension)
+            entry[format_name] = storage.save(name, ContentFile(content))
+        variants['sizes'][variant] = entry
+
+    # Alleen bijwerken als de afbeelding intussen niet opnieuw is vervangen. Via
+    # save(), zodat de Product signals de catalogus en featured caches ongeldig maken.
+    with transaction.atomic():
+        product = (
+            Product.objects.select_for_update()
+            .filter(pk=product_id, image=image_name)
+            .only('id', 'sku', 'image', 'image_variants')
+            .first()
+        )
+        if product is not None:
+            product.image_variants = variants
+            product.save(update_fields=['image_variants', 'updated_at'])
+    if product is not None:
+        logger.info(f"Generated {len(variants['sizes'])} image variants for product {product_id}")
+    return variants
+
+
+def _generate_in_worker(product_id):
+    close_old_connections()
+    try:
+        generate_variants(product_id)
+    except Exception as e:
+        logger.error(f"Image variant generation failed for product {product_id}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(product_id):
+    """Plan variant generatie in de worker pool na de commit van de huidige transactie"""
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, product_id))
+
+
+def get_variant_urls(product, request=None):
+    """
+    srcset-achtige map voor de frontend:
+
+        {'thumbnail': {'width': 150, 'height': 150, 'webp': url, 'jpeg': url}, ...,
+         'srcset': {'webp': 'url 150w, url 400w, ...', 'jpeg': '...'}}
+    """
+    sizes = (product.image_variants or {}).get('sizes')
+    if not product.image or not sizes or product.image_variants.get('source') != product.image.name:
+        return None
+
+    storage = product.image.storage
+
+    def absolute(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    result = {}
+    srcset = {format_name: [] for format_name in VARIANT_FORMATS}
+    for variant, entry in sizes.items():
+        urls = {'width': entry['width'], 'height': entry['height']}
+        for format_name in VARIANT_FORMATS:
+            if entry.get(format_name):
+                urls[format_name] = absolute(entry[format_name])
+                srcset[format_name].append(f"{urls[format_name]} {entry['width']}w")
+        result[variant] = urls
+
+    result['srcset'] = {format_name: ', '.join(items) for format_name, items in srcset.items()}
+    return result
@@ -0,0 +1,173 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .catalog_cache import bump_catalog_version
+from .featured_products import bump_featured_version
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Niet genoeg voorraad; `shortages` is {product_id: (gevraagd, beschikbaar)}"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Onvoldoende voorraad voor product(en) {', '.join(map(str, sorted(shortages)))}")
+
+
+def get_reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'PAYMENT_TIMEOUT_MINUTES', 15))
+
+
+def get_shortages(quantities, lock=False):
+    """
+    Beschikbaarheid van alle regels in één query: {product_id: (gevraagd, beschikbaar)}.
+
+    Met lock=True (binnen een transactie) worden de product rijen in primary
+    key volgorde gelockt, dus twee checkouts met overlappende producten
+    wachten op elkaar in plaats van te deadlocken.
+    """
+    from api.models import Product
+
+    products = Product.objects.filter(pk__in=quantities, is_active=True).order_by('pk')
+    if lock:
+        products = products.select_for_update()
+    stock = dict(products.values_list('id', 'stock'))
+    return {
+        product_id: (quantity, stock.get(product_id, 0))
+        for product_id, quantity in quantities.items()
+        if stock.get(product_id, 0) < quantity
+    }
+
+
+def change_stock(quantities, sign):
+    """
+    Boek `quantities` ({product_id: aantal}) af (sign=-1) of terug (sign=1) in één UPDATE.
+
+    Afboeken is conditioneel (stock >= aantal per rij); geeft het aantal
+    bijgewerkte rijen terug. Product signals lopen niet, dus de catalogus
+    caches worden hier na de commit ongeldig gemaakt.
+    """
+    from api.models import Product
+
+    if not quantities:
+        return 0
+    amount = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    condition = Q(pk__in=quantities)
+    if sign < 0:
+        condition = Q()
+        for product_id, quantity in quantities.items():
+            condition |= Q(pk=product_id, stock__gte=quantity)
+
+    updated = Product.objects.filter(condition).update(
+        stock=F('stock') + amount * sign,
+        updated_at=timezone.now(),
+    )
+    transaction.on_commit(bump_catalog_version)
+    transaction.on_commit(bump_featured_version)
+    return updated
+
+
+def reserve_stock(order, quantities, commit=False):
+    """
+    Boek de voorraad van een order af en leg reserveringen vast (binnen de checkout transactie).
+
+    Vaste kosten, ongeacht het aantal regels: één gelockte beschikbaarheid
+    check, één conditionele UPDATE en één bulk_create. Bij een tekort gaat
+    InsufficientStock omhoog en rolt de transactie alles terug. Met
+    commit=True (al betaald) is de reservering meteen definitief, anders
+    verloopt hij na PAYMENT_TIMEOUT_MINUTES.
+    """
+    from api.models import StockReservation
+
+    shortages = get_shortages(quantities, lock=True)
+    if shortages:
+        raise InsufficientStock(shortages)
+    if change_stock(quantities, -1) != len(quantities):
+        # Alleen mogelijk zonder row locks (SELECT FOR UPDATE): opnieuw bepalen wat ontbreekt
+        raise InsufficientStock(get_shortages(quantities) or dict.fromkeys(quantities, (0, 0)))
+
+    expires_at = None if commit else timezone.now() + get_reservation_ttl()
+    return StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order,
+            product_id=product_id,
+            quantity=quantity,
+            status='committed' if commit else 'held',
+            expires_at=expires_at,
+        )
+        for product_id, quantity in sorted(quantities.items())
+    ])
+
+
+def commit_reservations(order):
+    """
+    Betaling geslaagd: reserveringen worden definitief (voorraad blijft afgeboekt).
+
+    Een reservering die al verlopen en vrijgegeven is (late betaling) boekt
+    de voorraad opnieuw conditioneel af. Is die intussen verkocht, dan gaat
+    InsufficientStock omhoog en verandert er niets: de order moet met de hand
+    afgehandeld worden.
+    """
+    from api.models import StockReservation
+
+    with transaction.atomic():
+        rows = list(
+            StockReservation.objects.filter(order=order, status__in=('held', 'released'))
+            .select_for_update().order_by('pk').values_list('pk', 'product_id', 'quantity', 'status')
+        )
+        if not rows:
+            return 0
+
+        quantities = {}
+        for _, product_id, quantity, reservation_status in rows:
+            if reservation_status == 'released':
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if quantities:
+            shortages = get_shortages(quantities, lock=True)
+            if shortages:
+                raise InsufficientStock(shortages)
+            if change_stock(quantities, -1) != len(quantities):
+                raise InsufficientStock(get_shortages(quantities) or dict.fromkeys(quantities, (0, 0)))
+            logger.info(f"Re-reserved stock for late payment of order {order.pk}")
+
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _, _ in rows]).update(
+            status='committed', expires_at=None, updated_at=timezone.now(),
+        )
+    return len(rows)
+
+
+def release_reservations(reservations):
+    """
+    Geef openstaande reserveringen (queryset) vrij en boek de voorraad terug.
+
+    De reserveringen worden eerst gelockt en op 'held' gecontroleerd, zodat
+    een webhook en de opruim command dezelfde voorraad nooit twee keer terugboeken.
+    """
+    from api.models import StockReservation
+
+    with transaction.atomic():
+        rows = list(
+            reservations.filter(status='held').select_for_update().order_by('pk').values_list('pk', 'product_id', 'quantity')
+        )
+        if not rows:
+            return 0
+
+        quantities = {}
+        for _, product_id, quantity in rows:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+            status='released', updated_at=timezone.now(),
+        )
+        change_stock(quantities, 1)
+
+    logger.info(f"Released {len(rows)} stock reservations ({sum(quantities.values())} items)")
+    return len(rows)
@@ -1,9 +1,12 @@
 import mollie
 from django.conf import settings
 from decimal import Decimal
+from django.db import transaction
 from django.utils import timezone
 import logging
 
+from .inventory import InsufficientStock, commit_reservations, release_reservations
+
 logger = logging.getLogger(__name__)
 
 class MollieService:
@@ -44,7 +47,7 @@ class MollieService:
             
             # Update order with Mollie payment info
             order.payment_reference = payment.id
-            order.save()
+            order.save(update_fields=['payment_reference', 'updated_at'])
             
             # Create payment transaction record (we'll add PaymentTransaction model later)
             logger.info(f"Created Mollie payment {payment.id} for order {order.order_number}")
@@ -99,18 +102,34 @@ class MollieService:
                 return False
             
             # Update order based on payment status
+            previous = (order.payment_status, order.status)
             if payment.status == 'paid':
                 order.payment_status = 'paid'
                 order.status = 'processing'
                 
-                # Send confirmation email (implement later)
-                self._send_order_confirmation(order)
-                
             elif payment.status in ['failed', 'expired', 'cancelled']:
                 order.payment_status = 'failed'
                 order.status = 'cancelled'
             
-            order.save()
+            # Alleen de status kolommen; herhaalde webhooks zonder wijziging schrijven niets
+            if (order.payment_status, order.status) != previous:
+                with transaction.atomic():
+                    order.save(update_fields=['payment_status', 'status', 'updated_at'])
+                    # Gereserveerde voorraad definitief maken of teruggeven
+                    if order.payment_status == 'paid':
+                        try:
+                            commit_reservations(order)
+                        except InsufficientStock as e:
+                            # Reservering verlopen en voorraad intussen verkocht: handmatig afhandelen
+                            logger.error(f"Order {order.order_number} paid after its reservation expired: {str(e)}")
+                            note = f"Betaald na verlopen reservering, voorraad niet meer beschikbaar: {str(e)}"
+                            order.admin_notes = f"{order.admin_notes}\n{note}".strip()
+                            order.save(update_fields=['admin_notes', 'updated_at'])
+                    else:
+                        release_reservations(order.stock_reservations.all())
+                if order.payment_status == 'paid':
+                    # Send confirmation email (implement later)
+                    self._send_order_confirmation(order)
             
             logger.info(f"Processed webhook for payment {payment_id}, status: {payment.status}")
             return True
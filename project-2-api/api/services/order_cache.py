@@ -0,0 +1,80 @@
+import hashlib
+import time
+
+from .catalog_cache import get_cache_timeout, get_catalog_cache
+
+STAFF_SCOPE = 'all'  # Staff ziet alle orders: één gedeelde versie
+
+
+def get_version_key(scope):
+    return f"orders:{scope}:version"
+
+
+def get_order_list_version(scope):
+    """Versie van de order lijst van een gebruiker (of STAFF_SCOPE), start op een tijdstempel"""
+    cache = get_catalog_cache()
+    key = get_version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_order_list_versions(user_id):
+    """Order (regels) gewijzigd: lijst van de klant en het staff overzicht ongeldig maken"""
+    cache = get_catalog_cache()
+    scopes = [STAFF_SCOPE] if user_id is None else [f"user:{user_id}", STAFF_SCOPE]
+    for scope in scopes:
+        key = get_version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def get_request_scope(request):
+    return STAFF_SCOPE if request.user.is_staff else f"user:{request.user.pk}"
+
+
+def build_order_list_cache_key(request, scope, version):
+    """Gekeyed op gebruiker (of staff), versie, gesorteerde query parameters en Accept header"""
+    params = sorted(
+        (key, value)
+        for key in request.GET
+        for value in request.GET.getlist(key)
+    )
+    parts = [
+        request.build_absolute_uri(request.path),
+        repr(params),
+        request.META.get('HTTP_ACCEPT', ''),
+    ]
+    digest = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return f"orders:{scope}:v{version}:{digest}"
+
+
+def get_or_set_order_list_response(request, build_response):
+    """
+    Gecachte order lijst voor deze gebruiker, of bouw en cache hem.
+
+    Entries kunnen lang leven (met een gedeelde cache): elke wijziging aan een
+    order, order regel of de totalen verhoogt de versie van de klant (en van
+    staff), zie signals en services.orders.
+    """
+    cache = get_catalog_cache()
+    scope = get_request_scope(request)
+    cache_key = build_order_list_cache_key(request, scope, get_order_list_version(scope))
+
+    response = cache.get(cache_key)
+    if response is not None:
+        response['X-Cache-Status'] = 'HIT'
+        return response
+
+    response = build_response()
+    response['X-Cache-Status'] = 'MISS'
+
+    if response.status_code == 200:
+        timeout = get_cache_timeout('ORDER_LIST_CACHE_TIMEOUT', 60 * 60 * 24)
+        response.add_post_render_callback(lambda r: cache.set(cache_key, r, timeout))
+    return response
@@ -0,0 +1,76 @@
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+ORDER_NUMBER_PREFIX = 'HC'
+
+# Per proces gereserveerde blokken: {dag: [volgende, laatste]}
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def get_block_size():
+    return max(1, getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1))
+
+
+def format_order_number(day, sequence):
+    return f"{ORDER_NUMBER_PREFIX}{day:%Y%m%d}{sequence:04d}"
+
+
+def reserve_sequence_block(day, size):
+    """
+    Reserveer `size` volgnummers voor `day` in de teller rij; geeft (eerste, laatste).
+
+    Eén INSERT ... ON CONFLICT ... RETURNING: de rij lock duurt alleen dit
+    statement. Roep dit buiten de checkout transactie aan, anders blijft de
+    rij gelockt tot de hele checkout klaar is.
+    """
+    from api.models import OrderNumberSequence
+
+    if connection.vendor in ('postgresql', 'sqlite'):
+        table = connection.ops.quote_name(OrderNumberSequence._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (day, last_value) VALUES (%s, %s)
+                ON CONFLICT (day) DO UPDATE SET last_value = {table}.last_value + excluded.last_value
+                RETURNING last_value
+                """,
+                [connection.ops.adapt_datefield_value(day), size],
+            )
+            last = cursor.fetchone()[0]
+    else:
+        # Zonder ON CONFLICT: rij aanmaken als hij ontbreekt, dan atomair ophogen
+        with transaction.atomic():
+            OrderNumberSequence.objects.bulk_create([OrderNumberSequence(day=day)], ignore_conflicts=True)
+            OrderNumberSequence.objects.filter(day=day).update(last_value=F('last_value') + size)
+            last = OrderNumberSequence.objects.filter(day=day).values_list('last_value', flat=True).get()
+    return last - size + 1, last
+
+
+def allocate_order_number(day=None):
+    """
+    Volgend ordernummer HC{YYYYMMDD}{NNNN}, botsingsvrij tussen processen.
+
+    Met ORDER_NUMBER_BLOCK_SIZE > 1 reserveert elk proces een blok nummers en
+    deelt die zonder database query uit. Nummers zijn dan uniek maar niet
+    strikt oplopend in tijd; niet gebruikte nummers (herstart, mislukte
+    checkout) blijven als gat over.
+    """
+    day = day or timezone.localdate()
+    size = get_block_size()
+    if size == 1:
+        return format_order_number(day, reserve_sequence_block(day, 1)[0])
+
+    with _blocks_lock:
+        block = _blocks.get(day)
+        if block is None or block[0] > block[1]:
+            # Blokken van vorige dagen zijn niet meer nodig
+            _blocks.clear()
+            block = _blocks[day] = list(reserve_sequence_block(day, size))
+        sequence = block[0]
+        block[0] += 1
+    return format_order_number(day, sequence)
@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .order_cache import bump_order_list_versions
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def order_totals_expressions(order_item_model):
+    """Subtotaal, BTW en totaal van een order uit de regels, als expressies voor één UPDATE"""
+    items = order_item_model.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    subtotal = Coalesce(
+        Subquery(items.annotate(total=Sum('total_price')).values('total'), output_field=MONEY),
+        Value(Decimal('0')),
+        output_field=MONEY,
+    )
+    # SET gebruikt de oude kolomwaarden: BTW en totaal rekenen met de subquery zelf
+    tax_amount = ExpressionWrapper(subtotal * F('tax_rate'), output_field=MONEY)
+    return {
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'total_amount': ExpressionWrapper(subtotal + tax_amount + F('shipping_cost'), output_field=MONEY),
+    }
+
+
+def recalculate_order_totals(orders, **extra):
+    """
+    Tel de totalen van `orders` (queryset) opnieuw uit de opgeslagen regels, in één UPDATE.
+
+    Een UPDATE stuurt geen post_save: de gecachte order lijsten van de
+    eigenaren (en staff) worden hier na de commit ongeldig gemaakt.
+    """
+    from api.models import OrderItem
+
+    user_ids = set(orders.values_list('user_id', flat=True))
+    updated = orders.update(**order_totals_expressions(OrderItem), **extra)
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: bump_order_list_versions(user_id))
+    return updated
@@ -0,0 +1,189 @@
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'api_product_search'
+
+# Per database: bestaat de zoekindex tabel (voorkomt een introspectie query per call)
+_search_table_available = {}
+
+
+class PostgresProductSearch:
+    """
+    Full-text zoeken via een tsvector index met de Nederlandse configuratie.
+
+    Gewichten: naam (A), korte beschrijving (B), kenmerken (C), beschrijving (D).
+    """
+
+    config = 'dutch'
+
+    def index_products(self, product_ids):
+        """Werk de zoekindex bij voor de gegeven producten (upsert)"""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (product_id, document)
+                SELECT id,
+                       setweight(to_tsvector(%s, coalesce(name_nl, '')), 'A') ||
+                       setweight(to_tsvector(%s, coalesce(short_description, '')), 'B') ||
+                       setweight(to_tsvector(%s, coalesce(features, '')), 'C') ||
+                       setweight(to_tsvector(%s, coalesce(description, '')), 'D')
+                FROM api_product
+                WHERE id = ANY(%s)
+                ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                [self.config] * 4 + [product_ids],
+            )
+
+    def remove_products(self, product_ids):
+        """Verwijderen gebeurt via ON DELETE CASCADE op product_id"""
+        return
+
+    def search(self, query, limit):
+        """Product ids gesorteerd op relevantie (ts_rank_cd)"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT product_id
+                FROM {SEARCH_TABLE}, websearch_to_tsquery(%s, %s) AS query
+                WHERE document @@ query
+                ORDER BY ts_rank_cd(document, query) DESC, product_id
+                LIMIT %s
+                """,
+                [self.config, query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteProductSearch:
+    """
+    FTS5 fallback voor lokale ontwikkeling.
+
+    FTS5 heeft geen Nederlandse stemmer; zoektermen worden daarom als
+    prefix gezocht ("honing" vindt ook "honingpot"). Rangschikking via bm25
+    met dezelfde veldgewichten als de Postgres index.
+    """
+
+    columns = ('name_nl', 'short_description', 'features', 'description')
+    weights = (10.0, 5.0, 2.0, 1.0)
+
+    def index_products(self, product_ids):
+        """Werk de zoekindex bij voor de gegeven producten (rowid = product id)"""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        columns = ', '.join(self.columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM api_product WHERE id IN ({placeholders})",
+                product_ids,
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+
+    def build_match_query(self, query):
+        """Zet vrije tekst om naar een veilige FTS5 query (AND van prefix termen)"""
+        terms = re.findall(r'\w+', query.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit):
+        """Product ids gesorteerd op relevantie (bm25)"""
+        match_query = self.build_match_query(query)
+        if not match_query:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT rowid
+                FROM {SEARCH_TABLE}
+                WHERE {SEARCH_TABLE} MATCH %s
+                ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid
+                LIMIT %s
+                """,
+                [match_query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresProductSearch,
+    'sqlite': SQLiteProductSearch,
+}
+
+
+def get_search_backend():
+    """
+    Zoek backend voor de huidige database, of None als er geen zoekindex is.
+
+    Zonder backend valt ProductViewSet terug op de standaard icontains search.
+    """
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return None
+    database = connection.settings_dict['NAME']
+    if database not in _search_table_available:
+        _search_table_available[database] = SEARCH_TABLE in connection.introspection.table_names()
+        if not _search_table_available[database]:
+            logger.warning(f"Search index table {SEARCH_TABLE} missing - falling back to icontains search")
+    if not _search_table_available[database]:
+        return None
+    return backend_class()
+
+
+def index_products(product_ids):
+    backend = get_search_backend()
+    if backend is not None:
+        backend.index_products(product_ids)
+
+
+def remove_products(product_ids):
+    backend = get_search_backend()
+    if backend is not None:
+        backend.remove_products(product_ids)
+
+
+class SearchResults(list):
+    """Gerangschikte product ids; `truncated` als er meer treffers zijn dan de limiet"""
+
+    truncated = False
+
+
+def search_products(query, limit=None):
+    """
+    Gerangschikte product ids, of None als er geen zoekindex beschikbaar is.
+
+    Er wordt één id meer opgehaald dan de limiet, zodat afgekapte resultaten
+    (count en latere pagina's kloppen dan niet) herkenbaar zijn aan `truncated`.
+    """
+    backend = get_search_backend()
+    if backend is None:
+        return None
+    if limit is None:
+        limit = getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 1000)
+    product_ids = backend.search(query, limit + 1)
+    results = SearchResults(product_ids[:limit])
+    results.truncated = len(product_ids) > limit
+    return results
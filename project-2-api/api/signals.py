@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CartItem, Order, OrderItem, Product, ShoppingCart
+from .services import catalog_stats, image_variants, product_search
+from .services.cart import adjust_cart_totals, recalculate_cart_totals
+from .services.catalog_cache import bump_catalog_version
+from .services.featured_products import bump_featured_version
+from .services.order_cache import bump_order_list_versions
+from .services.orders import recalculate_order_totals
+
+
+# Product wijzigingen (admin, import, checkout) maken de catalogus cache ongeldig.
+# Pas na de commit verhogen, anders kan een gelijktijdige request oude data
+# onder de nieuwe versie cachen.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+    # Facet tellingen voor de nieuwe versie opbouwen (na de bump), buiten het request
+    transaction.on_commit(catalog_stats.schedule_catalog_stats_refresh)
+
+
+# Featured payload alleen ongeldig maken als het product featured is of was
+def is_featured_product(product):
+    return bool(product.is_featured and product.is_active)
+
+
+def was_featured_product(product):
+    """Featured stand bij het laden (Product.from_db); None als die onbekend is"""
+    loaded = getattr(product, '_loaded_state', {})
+    if 'is_featured' not in loaded or 'is_active' not in loaded:
+        return None
+    return bool(loaded['is_featured'] and loaded['is_active'])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_featured_products(sender, instance, created=False, **kwargs):
+    if {'is_featured', 'is_active'} & instance.get_deferred_fields():
+        changed = True  # Niet geladen (bijv. .only()): voor de zekerheid
+    else:
+        was_featured = False if created else was_featured_product(instance)
+        changed = is_featured_product(instance) or was_featured is not False
+    if changed:
+        transaction.on_commit(bump_featured_version)
+
+
+# Zoekindex incrementeel bijwerken (in dezelfde transactie als het product)
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    product_search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    product_search.remove_products([instance.pk])
+
+
+# Afbeelding varianten genereren in de worker pool als er een nieuwe upload is
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, **kwargs):
+    if not instance.image:
+        if instance.image_variants:
+            Product.objects.filter(pk=instance.pk).update(image_variants={})
+        return
+    if instance.image_variants.get('source') != instance.image.name:
+        image_variants.schedule_variants(instance.pk)
+
+
+# Wagen tellers (item_count/subtotal) bijhouden met het verschil per CartItem wijziging
+@receiver(post_save, sender=CartItem)
+def update_cart_totals_on_save(sender, instance, created, **kwargs):
+    if created:
+        adjust_cart_totals(instance.cart_id, instance.quantity, instance.product.price * instance.quantity)
+        return
+
+    loaded_product_id, loaded_quantity = getattr(instance, '_loaded_state', (None, None))
+    if loaded_product_id != instance.product_id or loaded_quantity is None:
+        # Onbekende vorige stand (of ander product): wagen volledig hertellen
+        recalculate_cart_totals(ShoppingCart.objects.filter(pk=instance.cart_id))
+    elif loaded_quantity != instance.quantity:
+        difference = instance.quantity - loaded_quantity
+        adjust_cart_totals(instance.cart_id, difference, instance.product.price * difference)
+    instance._loaded_state = (instance.product_id, instance.quantity)
+
+
+@receiver(post_delete, sender=CartItem)
+def update_cart_totals_on_delete(sender, instance, **kwargs):
+    loaded_product_id, loaded_quantity = getattr(instance, '_loaded_state', (instance.product_id, instance.quantity))
+    if loaded_product_id != instance.product_id or loaded_quantity is None:
+        recalculate_cart_totals(ShoppingCart.objects.filter(pk=instance.cart_id))
+        return
+    adjust_cart_totals(instance.cart_id, -loaded_quantity, -(instance.product.price * loaded_quantity))
+
+
+# Prijswijziging: subtotaal van wagens met dit product opnieuw tellen. Alleen
+# als de prijs echt veranderd is (niet bij elke voorraad of tekst wijziging).
+def price_changed(product, update_fields):
+    if update_fields is not None and 'price' not in update_fields:
+        return False
+    if 'price' in product.get_deferred_fields():
+        return True
+    loaded = getattr(product, '_loaded_state', {})
+    return 'price' not in loaded or loaded['price'] != product.price
+
+
+@receiver(post_save, sender=Product)
+def update_cart_subtotals(sender, instance, created, update_fields=None, **kwargs):
+    if not created and price_changed(instance, update_fields):
+        recalculate_cart_totals(ShoppingCart.objects.filter(items__product=instance))
+
+
+# Order totalen (en de gecachte order lijsten) volgen de regels (bulk_create bij
+# checkout rekent ze zelf vooraf uit)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), Order):
+        return  # De hele order wordt verwijderd
+    recalculate_order_totals(Order.objects.filter(pk=instance.order_id), updated_at=timezone.now())
+
+
+# Gecachte order lijsten (klant en staff) ongeldig maken, na de commit
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_lists(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_order_list_versions(user_id))
+
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Bestandsopslag op basis van de inhoud (SHA-256).
+
+    `products/foto.jpg` wordt opgeslagen als `products/<sha256>.jpg`. Dezelfde
+    afbeelding opnieuw uploaden levert dezelfde naam op en schrijft niets
+    extra weg: geen `_92sbyXs` kopieën meer, en downstream caches (browser,
+    CDN) zien één URL per afbeelding.
+    """
+
+    hash_chunk_size = 64 * 1024
+
+    def content_hash(self, content):
+        """SHA-256 van de inhoud; de file positie wordt teruggezet op 0"""
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        if hasattr(content, 'chunks'):
+            chunks = content.chunks(self.hash_chunk_size)
+        else:
+            chunks = iter(lambda: content.read(self.hash_chunk_size), b'')
+        for chunk in chunks:
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return digest.hexdigest()
+
+    def content_name(self, name, content):
+        """Inhoud-gebaseerde naam in dezelfde map met dezelfde extensie"""
+        directory = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, f"{self.content_hash(content)}{extension}")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.content_name(name, content)
+        # Zelfde inhoud staat er al: niets opnieuw wegschrijven
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def get_product_image_storage():
+    """Storage voor Product.image (callable zodat migraties geen pad vastleggen)"""
+    return ContentAddressedStorage()
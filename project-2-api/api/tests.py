@@ -1,3 +1,998 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Address, CartItem, Order, OrderItem, OrderNumberSequence, Product, ShoppingCart, StockReservation,
+)
+from .services import catalog_stats, featured_products, order_numbers
+from .services.cart import upsert_cart_items
+from .services.catalog_cache import get_cache_timeout, get_catalog_cache, get_catalog_version, is_shared_cache
+from .services.inventory import InsufficientStock, commit_reservations, release_reservations, reserve_stock
+
+
+def create_product(**kwargs):
+    defaults = {
+        'name_nl': 'Manuka Honing', 'description': 'Test', 'price': Decimal('12.50'),
+        'category': 'honing', 'stock': 100,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+def finish_stats_refresh():
+    """Wacht op een geplande rebuild van de tellingen en gooi de (buiten de test transactie) opgebouwde cache weg"""
+    if catalog_stats._executor is not None:
+        catalog_stats._executor.submit(lambda: None).result()
+    get_catalog_cache().clear()
+
+
+class CartUpsertTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        self.cart = ShoppingCart.objects.create(user=self.user)
+        self.product = create_product()
+
+    def test_upsert_creates_and_increments(self):
+        upsert_cart_items(self.cart.pk, {self.product.pk: 2})
+        upsert_cart_items(self.cart.pk, {self.product.pk: 3})
+
+        item = CartItem.objects.get(cart=self.cart, product=self.product)
+        self.assertEqual(item.quantity, 5)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.item_count, 5)
+        self.assertEqual(self.cart.subtotal, Decimal('62.50'))
+
+    def test_add_to_cart_view(self):
+        self.client.force_login(self.user)
+        for _ in range(2):
+            response = self.client.post(
+                '/api/cart/', {'product_id': self.product.pk, 'quantity': 2},
+                content_type='application/json', secure=True,
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cart_total_items'], 4)
+
+        response = self.client.post(
+            '/api/cart/', {'product_id': self.product.pk, 'quantity': 0},
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_price_change_updates_cart_subtotal(self):
+        upsert_cart_items(self.cart.pk, {self.product.pk: 2})
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = Decimal('10.00')
+        product.save()
+
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, Decimal('20.00'))
+
+    def test_other_product_changes_skip_cart_recount(self):
+        upsert_cart_items(self.cart.pk, {self.product.pk: 2})
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock = 3
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        self.assertFalse([query for query in queries if 'api_shoppingcart' in query['sql']])
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        self.cart = ShoppingCart.objects.create(user=self.user)
+        self.product = create_product()
+        self.other = create_product(name_nl='Propolis')
+        upsert_cart_items(self.cart.pk, {self.product.pk: 2})
+        self.client.force_login(self.user)
+
+    def batch(self, operations):
+        return self.client.post(
+            '/api/cart/batch/', {'operations': operations},
+            content_type='application/json', secure=True,
+        )
+
+    def get_quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_batch_applies_all_operations(self):
+        response = self.batch([
+            {'op': 'add', 'product_id': self.other.pk, 'quantity': 3},
+            {'op': 'set', 'product_id': self.product.pk, 'quantity': 5},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_items'], 8)
+        self.assertEqual(self.get_quantities(), {self.product.pk: 5, self.other.pk: 3})
+
+        self.assertEqual(self.batch([{'op': 'remove', 'product_id': self.product.pk}]).status_code, 200)
+        self.assertEqual(self.get_quantities(), {self.other.pk: 3})
+
+    def test_invalid_operation_rejects_whole_batch(self):
+        inactive = create_product(name_nl='Uitverkocht', is_active=False)
+        response = self.batch([
+            {'op': 'add', 'product_id': self.other.pk, 'quantity': 3},
+            {'op': 'set', 'product_id': self.product.pk, 'quantity': -1},
+            {'op': 'add', 'product_id': inactive.pk},
+            {'op': 'move', 'product_id': self.product.pk},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 3, 2])
+        self.assertEqual(self.get_quantities(), {self.product.pk: 2})
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.item_count, 2)
+
+
+class ConcurrentCartUpsertTests(TransactionTestCase):
+    """Veel gelijktijdige "in winkelwagen" klikken op één wagen: geen verloren updates"""
+
+    threads = 8
+    clicks_per_thread = 10
+
+    def test_concurrent_increments(self):
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        cart = ShoppingCart.objects.create(user=user)
+        product = create_product()
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def click():
+            try:
+                start.wait()
+                for _ in range(self.clicks_per_thread):
+                    upsert_cart_items(cart.pk, {product.pk: 1})
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=click) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        expected = self.threads * self.clicks_per_thread
+        self.assertEqual(CartItem.objects.get(cart=cart, product=product).quantity, expected)
+        cart.refresh_from_db()
+        self.assertEqual(cart.item_count, expected)
+        self.assertEqual(cart.subtotal, product.price * expected)
+
+
+class SweepCartsTests(TestCase):
+    def setUp(self):
+        self.product = create_product()
+        self.old = timezone.now() - timedelta(days=100)
+        self.stale_cart = self.create_cart('oud', {self.product.pk: 1})
+        self.active_cart = self.create_cart('actief', {self.product.pk: 2})
+        ShoppingCart.objects.filter(pk=self.stale_cart.pk).update(updated_at=self.old)
+
+    def create_cart(self, username, quantities):
+        user = User.objects.create_user(username, f'{username}@example.nl', 'wachtwoord')
+        cart = ShoppingCart.objects.create(user=user)
+        upsert_cart_items(cart.pk, quantities)
+        return cart
+
+    def sweep(self, *args):
+        output = StringIO()
+        call_command('sweep_carts', '--sleep', '0', *args, stdout=output)
+        return output.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        output = self.sweep('--dry-run')
+        self.assertIn('1 wagens, 1 items, 0 verweesde items', output)
+        self.assertEqual(ShoppingCart.objects.count(), 2)
+
+    def test_only_carts_past_the_cutoff_are_deleted(self):
+        self.sweep()
+        self.assertEqual(list(ShoppingCart.objects.values_list('pk', flat=True)), [self.active_cart.pk])
+        self.assertEqual(CartItem.objects.filter(cart=self.active_cart).count(), 1)
+
+        self.sweep('--max-age', '0')
+        self.assertFalse(ShoppingCart.objects.exists())
+
+    def test_old_items_of_inactive_products_are_removed(self):
+        inactive = create_product(name_nl='Uit assortiment', price=Decimal('5.00'))
+        upsert_cart_items(self.active_cart.pk, {inactive.pk: 1})
+        Product.objects.filter(pk=inactive.pk).update(is_active=False)
+        CartItem.objects.filter(product=inactive).update(updated_at=self.old)
+
+        self.assertIn('1 verweesde items', self.sweep())
+        self.assertFalse(CartItem.objects.filter(product=inactive).exists())
+        self.active_cart.refresh_from_db()
+        self.assertEqual((self.active_cart.item_count, self.active_cart.subtotal), (2, Decimal('25.00')))
+
+
+class GuestCartLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        self.product = create_product()
+        self.other = create_product(name_nl='Propolis')
+
+    def login(self):
+        return self.client.post(
+            '/api/token/', {'username': 'klant', 'password': 'wachtwoord'},
+            content_type='application/json', secure=True,
+        )
+
+    def test_login_merges_guest_cart_and_clears_cookie(self):
+        cart = ShoppingCart.objects.create(user=self.user)
+        upsert_cart_items(cart.pk, {self.product.pk: 1})
+        response = self.client.post(
+            '/api/cart/guest/', [
+                {'product_id': self.product.pk, 'quantity': 2},
+                {'product_id': self.other.pk, 'quantity': 3},
+            ],
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hc_guest_cart', self.client.cookies)
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        quantities = dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.product.pk: 3, self.other.pk: 3})
+        cookie = response.cookies['hc_guest_cart']
+        self.assertEqual(cookie.value, '')
+        self.assertEqual(cookie['max-age'], 0)
+
+    def test_login_without_guest_cookie(self):
+        response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'access', 'refresh', 'user'})
+        self.assertEqual(data['user']['email'], 'klant@example.nl')
+        self.assertNotIn('hc_guest_cart', response.cookies)
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+
+    def test_failed_login_keeps_guest_cart(self):
+        self.client.post(
+            '/api/cart/guest/', {'product_id': self.product.pk, 'quantity': 2},
+            content_type='application/json', secure=True,
+        )
+        response = self.client.post(
+            '/api/token/', {'username': 'klant', 'password': 'fout'},
+            content_type='application/json', secure=True,
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('hc_guest_cart', response.cookies)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class FeaturedInvalidationTests(TestCase):
+    """Featured payload alleen ongeldig bij (vroeger) featured producten, zonder extra query"""
+
+    def tearDown(self):
+        finish_stats_refresh()
+
+    def save_and_get_version_change(self, product):
+        version = featured_products.get_featured_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                product.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        return featured_products.get_featured_version() - version
+
+    def test_non_featured_product_does_not_bump(self):
+        product = Product.objects.get(pk=create_product().pk)
+        product.stock = 5
+        self.assertEqual(self.save_and_get_version_change(product), 0)
+
+    def test_local_cache_keeps_no_process_payloads(self):
+        # LocMem: andere workers zien versie bumps niet, dus geen payload in het geheugen
+        create_product(is_featured=True)
+        response = self.client.get('/api/products/featured/', secure=True)
+        self.assertEqual((response.status_code, len(response.json())), (200, 1))
+        self.assertEqual(featured_products._payloads, {})
+        self.assertEqual(get_cache_timeout('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24 * 7), 300)
+
+    def test_unfeaturing_bumps_once(self):
+        product = Product.objects.get(pk=create_product(is_featured=True).pk)
+        product.is_featured = False
+        self.assertEqual(self.save_and_get_version_change(product), 1)
+        self.assertEqual(self.save_and_get_version_change(product), 0)
+
+
+@override_settings(CATALOG_STATS_REFRESH_DELAY=0.2)
+class CatalogStatsRefreshTests(TransactionTestCase):
+    """Facet tellingen worden buiten het request opnieuw opgebouwd, één keer per reeks writes"""
+
+    def test_burst_of_writes_rebuilds_once(self):
+        with self.assertLogs('api.services.catalog_stats', 'INFO') as logs:
+            for index in range(3):
+                create_product(name_nl=f'Product {index}')
+            # Wacht tot de (enige) worker klaar is
+            catalog_stats._executor.submit(lambda: None).result()
+
+        self.assertEqual(len([line for line in logs.output if 'rebuilt' in line]), 1)
+        self.assertEqual(catalog_stats.get_catalog_stats()['total'], 3)
+
+    def get_facets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/facets/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        grouped = [query for query in queries if 'GROUP BY' in query['sql']]
+        return response, grouped
+
+    def test_facets_serve_previous_counts_during_rebuild(self):
+        get_catalog_cache().clear()
+        create_product()
+        finish_stats_refresh()
+        response, grouped = self.get_facets()
+        self.assertEqual((response.json()['total'], len(grouped)), (1, 1))  # Koude cache
+
+        create_product(category='manuka')
+        response, grouped = self.get_facets()
+        self.assertEqual((response.json()['total'], grouped), (1, []))
+        self.assertEqual(self.get_facets()[0]['X-Cache-Status'], 'MISS')  # Verouderd: niet gecached
+
+        catalog_stats._executor.submit(lambda: None).result()
+        response, grouped = self.get_facets()
+        self.assertEqual((response.json()['total'], grouped), (2, []))
+        self.assertEqual(self.get_facets()[0]['X-Cache-Status'], 'HIT')
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    """Een product save/delete verhoogt de catalogus versie; de volgende response is een MISS"""
+
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.product = create_product()
+        self.other = create_product(name_nl='Propolis')
+
+    def tearDown(self):
+        finish_stats_refresh()
+
+    def get_cache_status(self, url):
+        response = self.client.get(url, secure=True)
+        return response.status_code, response['X-Cache-Status']
+
+    def write(self, action):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        catalog_stats.refresh_catalog_stats()  # Zoals de achtergrond rebuild
+        return get_catalog_version() - version
+
+    def test_save_invalidates_list_and_retrieve(self):
+        urls = ('/api/products/', f'/api/products/{self.product.pk}/')
+        for url in urls:
+            self.assertEqual(self.get_cache_status(url), (200, 'MISS'))
+            self.assertEqual(self.get_cache_status(url), (200, 'HIT'))
+
+        self.product.name_nl = 'Manuka Honing MGO 400'
+        self.assertEqual(self.write(self.product.save), 1)
+        for url in urls:
+            self.assertEqual(self.get_cache_status(url), (200, 'MISS'))
+        response = self.client.get(urls[1], secure=True)
+        self.assertEqual(response.json()['name_nl'], 'Manuka Honing MGO 400')
+
+    def test_delete_invalidates_list_and_retrieve(self):
+        url = f'/api/products/{self.other.pk}/'
+        self.assertEqual(self.get_cache_status('/api/products/'), (200, 'MISS'))
+        self.assertEqual(self.get_cache_status(url), (200, 'MISS'))
+
+        self.assertEqual(self.write(self.other.delete), 1)
+        response = self.client.get('/api/products/', secure=True)
+        self.assertEqual(response['X-Cache-Status'], 'MISS')
+        self.assertEqual([product['id'] for product in response.json()['results']], [self.product.pk])
+        self.assertEqual(self.client.get(url, secure=True).status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    """?search= via de zoekindex: gerangschikt op veldgewicht, afgekapt op PRODUCT_SEARCH_MAX_RESULTS"""
+
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.in_description = create_product(name_nl='Keelspray', description='Met propolis extract')
+        self.in_name = create_product(name_nl='Propolis Tinctuur')
+        self.in_features = create_product(name_nl='Zalf', features='Propolis, bijenwas')
+        create_product(name_nl='Manuka Honing')
+
+    def tearDown(self):
+        finish_stats_refresh()
+
+    def search(self, query):
+        response = self.client.get('/api/products/', {'search': query}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_results_ranked_by_field_weight(self):
+        response = self.search('propolis')
+        self.assertEqual(
+            [product['id'] for product in response.json()['results']],
+            [self.in_name.pk, self.in_features.pk, self.in_description.pk],
+        )
+        self.assertNotIn('X-Search-Truncated', response)
+
+    def test_prefix_match_and_explicit_ordering(self):
+        response = self.client.get('/api/products/', {'search': 'propo', 'ordering': 'name_nl'}, secure=True)
+        self.assertEqual(
+            [product['name_nl'] for product in response.json()['results']],
+            ['Keelspray', 'Propolis Tinctuur', 'Zalf'],
+        )
+
+    @override_settings(PRODUCT_SEARCH_MAX_RESULTS=2)
+    def test_truncated_results_flagged(self):
+        response = self.search('propolis')
+        self.assertEqual(response['X-Search-Truncated'], '2')
+        self.assertEqual(
+            [product['id'] for product in response.json()['results']],
+            [self.in_name.pk, self.in_features.pk],
+        )
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/304 op de catalogus: zonder product queries, ongeldig na een product write"""
+
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.product = create_product()
+
+    def tearDown(self):
+        finish_stats_refresh()
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True, **headers)
+        product_queries = [query for query in queries if 'api_product' in query['sql']]
+        return response, product_queries
+
+    def change_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('9.95')
+            self.product.save()
+        catalog_stats.refresh_catalog_stats()  # Zoals de achtergrond rebuild
+
+    def test_list_not_modified_without_queries(self):
+        for url in ('/api/products/', '/api/products/?search=honing'):
+            first, _ = self.get(url)
+            self.assertEqual(first.status_code, 200)
+
+            response, queries = self.get(url, first['ETag'])
+            self.assertEqual((response.status_code, queries), (304, []))
+
+    def test_search_runs_once_per_list(self):
+        _, queries = self.get('/api/products/?search=honing')
+        self.assertEqual(len([query for query in queries if 'api_product_search' in query['sql']]), 1)
+
+    def test_list_etag_changes_after_product_write(self):
+        first, _ = self.get('/api/products/')
+        self.change_product()
+        response, _ = self.get('/api/products/', first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_retrieve_not_modified_until_product_changes(self):
+        url = f'/api/products/{self.product.pk}/'
+        first, _ = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.get(url, first['ETag'])[0].status_code, 304)
+
+        self.change_product()
+        response, _ = self.get(url, first['ETag'])
+        self.assertEqual((response.status_code, response.json()['price']), (200, '9.95'))
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def run_command(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(*args, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_export_import_round_trip(self):
+        honey = create_product()
+        propolis = create_product(name_nl='Propolis', price=Decimal('8.95'), is_featured=True)
+
+        for name in ('catalogus.csv', 'catalogus.jsonl'):
+            with self.subTest(name=name):
+                self.run_command('catalog_export', self.path(name))
+                Product.objects.filter(pk=honey.pk).update(price=Decimal('1.00'))
+                Product.objects.filter(sku=propolis.sku).delete()
+
+                stdout, stderr = self.run_command('catalog_import', self.path(name))
+
+                self.assertIn('1 aangemaakt, 1 bijgewerkt, 0 ongeldig', stdout)
+                self.assertEqual(stderr, '')
+                self.assertEqual(Product.objects.get(pk=honey.pk).price, Decimal('12.50'))
+                restored = Product.objects.get(sku=propolis.sku)
+                self.assertEqual(
+                    (restored.name_nl, restored.price, restored.is_featured), ('Propolis', Decimal('8.95'), True),
+                )
+
+    def test_invalid_rows_reported_and_skipped(self):
+        with open(self.path('feed.csv'), 'w', encoding='utf-8', newline='') as feed:
+            feed.write('sku,name_nl,description,category,price,stock,is_active\n')
+            feed.write('HC-1,Propolis,Test,honing,"4,95",10,ja\n')
+            feed.write('HC-2,Manuka,Test,honing,gratis,10,ja\n')
+            feed.write('HC-3,Zalf,Test,honing,3.50,10,misschien\n')
+
+        stdout, stderr = self.run_command('catalog_import', self.path('feed.csv'), '--dry-run')
+        self.assertIn('[dry-run] Klaar: 0 aangemaakt, 0 bijgewerkt, 2 ongeldig', stdout)
+        self.assertFalse(Product.objects.exists())
+
+        stdout, stderr = self.run_command('catalog_import', self.path('feed.csv'))
+        self.assertIn('1 aangemaakt, 0 bijgewerkt, 2 ongeldig', stdout)
+        self.assertIn('Regel 3:', stderr)
+        self.assertIn('Regel 4:', stderr)
+        self.assertEqual(list(Product.objects.values_list('sku', 'price')), [('HC-1', Decimal('4.95'))])
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        self.cart = ShoppingCart.objects.create(user=self.user)
+        self.address = Address.objects.create(
+            user=self.user, first_name='Jan', last_name='Jansen', street_address='Dorpsstraat',
+            house_number='1', postal_code='1234 AB', city='Utrecht',
+        )
+        self.client.force_login(self.user)
+
+    def fill_cart(self, lines):
+        products = [create_product(name_nl=f'Product {index}') for index in range(lines)]
+        upsert_cart_items(self.cart.pk, {product.pk: 2 for product in products})
+
+    def checkout(self, **headers):
+        return self.client.post('/api/checkout/process/', {
+            'shipping_address_id': self.address.pk,
+            'billing_address_id': self.address.pk,
+            'ideal_bank': 'ing',
+            'terms_accepted': True,
+        }, content_type='application/json', secure=True, **headers)
+
+    def count_checkout_queries(self, lines):
+        self.fill_cart(lines)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        return len(queries)
+
+    def test_checkout_creates_order_and_clears_cart(self):
+        self.fill_cart(3)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(order_number=response.json()['order_number'])
+        self.assertEqual((order.status, order.payment_status), ('confirmed', 'paid'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.subtotal, Decimal('75.00'))
+        self.assertEqual(order.total_amount, Decimal('75.00') * Decimal('1.21') + Decimal('4.95'))
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (0, Decimal('0.00')))
+
+    def test_init_shows_the_shipping_cost_that_is_charged(self):
+        self.fill_cart(1)
+        preview = self.client.get('/api/checkout/init/', secure=True)
+        self.assertEqual(preview.status_code, 200)
+
+        self.checkout()
+        self.assertEqual(Decimal(str(preview.json()['shipping_cost'])), Order.objects.get().shipping_cost)
+
+    def test_checkout_decrements_stock(self):
+        self.fill_cart(2)
+        self.checkout()
+        self.assertEqual(list(Product.objects.values_list('stock', flat=True)), [98, 98])
+        self.assertEqual(
+            list(StockReservation.objects.values_list('quantity', 'status')), [(2, 'committed'), (2, 'committed')]
+        )
+
+    def test_insufficient_stock_rolls_back(self):
+        self.fill_cart(2)
+        Product.objects.filter(name_nl='Product 1').update(stock=1)
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['unavailable'][0]['available'], 1)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(sorted(Product.objects.values_list('stock', flat=True)), [1, 100])
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+
+    def test_release_restores_stock(self):
+        product = create_product(stock=5)
+        order = Order.objects.create(user=self.user)
+        reserve_stock(order, {product.pk: 3})
+        release_reservations(order.stock_reservations.all())
+        release_reservations(order.stock_reservations.all())
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+        self.assertEqual(StockReservation.objects.get().status, 'released')
+
+    def test_payment_after_expiry_reserves_stock_again(self):
+        product = create_product(stock=5)
+        order = Order.objects.create(user=self.user)
+        reserve_stock(order, {product.pk: 3})
+        release_reservations(order.stock_reservations.all())
+
+        self.assertEqual(commit_reservations(order), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 2)
+        self.assertEqual(StockReservation.objects.get().status, 'committed')
+
+    def test_payment_after_expiry_and_sell_out_changes_nothing(self):
+        product = create_product(stock=5)
+        order = Order.objects.create(user=self.user)
+        reserve_stock(order, {product.pk: 3})
+        release_reservations(order.stock_reservations.all())
+        reserve_stock(Order.objects.create(user=self.user), {product.pk: 4})
+
+        with self.assertRaises(InsufficientStock) as raised:
+            commit_reservations(order)
+        self.assertEqual(raised.exception.shortages, {product.pk: (3, 1)})
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 1)
+        self.assertEqual(order.stock_reservations.get().status, 'released')
+
+    def test_idempotency_key_replays_first_response(self):
+        self.fill_cart(2)
+        first = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+        retry = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_idempotency_key_with_other_body_is_rejected(self):
+        self.fill_cart(1)
+        self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+        response = self.client.post('/api/checkout/process/', {
+            'shipping_address_id': self.address.pk,
+            'billing_address_id': self.address.pk,
+            'ideal_bank': 'rabobank',
+            'terms_accepted': True,
+        }, content_type='application/json', secure=True, HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_failed_checkouts_do_not_use_order_numbers(self):
+        self.checkout()
+        self.fill_cart(1)
+        Product.objects.update(stock=1)
+        self.assertEqual(self.checkout().status_code, 409)
+        self.assertFalse(OrderNumberSequence.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart(self):
+        # Sessie + gebruiker, adressen, wagen check, ordernummer, gelockte wagen,
+        # order, voorraad (check, UPDATE, reserveringen), regels, wagen legen (2),
+        # regels voor de response, plus savepoints
+        queries = self.count_checkout_queries(1)
+        self.assertLessEqual(queries, 18)
+        self.assertEqual(self.count_checkout_queries(20), queries)
+
+
+class OrderTotalsTests(TestCase):
+    """BTW en totaal volgen verzendkosten en BTW tarief, ook bij een smalle UPDATE"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        order = Order.objects.create(user=self.user, shipping_cost=Decimal('4.95'))
+        OrderItem.objects.create(
+            order=order, product=create_product(), product_name='Manuka Honing',
+            unit_price=Decimal('50.00'), quantity=2, total_price=Decimal('100.00'),
+        )
+        self.order = Order.objects.get(pk=order.pk)
+
+    def save_and_capture(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            self.order.save(**kwargs)
+        self.assertEqual(len(queries), 1)
+        return queries[0]['sql']
+
+    def test_narrow_shipping_update_rewrites_totals(self):
+        self.order.shipping_cost = Decimal('0.00')
+        sql = self.save_and_capture(update_fields=['shipping_cost', 'updated_at'])
+
+        self.assertIn('"total_amount"', sql)
+        self.assertNotIn('"status"', sql)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.tax_amount, self.order.total_amount), (Decimal('21.00'), Decimal('121.00')))
+
+    def test_tax_rate_change_rewrites_totals(self):
+        self.order.tax_rate = Decimal('0.09')
+        self.order.save()
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.tax_amount, self.order.total_amount), (Decimal('9.00'), Decimal('113.95')))
+
+    def test_status_update_leaves_totals_alone(self):
+        self.order.status = 'shipped'
+        sql = self.save_and_capture(update_fields=['status', 'updated_at'])
+        self.assertNotIn('"total_amount"', sql)
+
+    def test_patch_shipping_cost_through_api(self):
+        self.client.force_login(self.user)
+        response = self.client.patch(
+            f'/api/orders/{self.order.pk}/', {'shipping_cost': '10.00'},
+            content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['total_amount']), Decimal('131.00'))
+
+
+class OrderListCacheTests(TestCase):
+    """Gecachte order lijsten: per klant gescheiden, staff deelt één lijst, wijzigingen meteen zichtbaar"""
+
+    def setUp(self):
+        get_catalog_cache().clear()
+        self.alice = User.objects.create_user('alice', 'alice@example.nl', 'wachtwoord')
+        self.bob = User.objects.create_user('bob', 'bob@example.nl', 'wachtwoord')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice_order = Order.objects.create(user=self.alice)
+            self.bob_order = Order.objects.create(user=self.bob)
+
+    def list_orders(self, user):
+        self.client.force_login(user)
+        response = self.client.get('/api/orders/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache-Status'], {order['order_number']: order for order in response.json()['results']}
+
+    def test_users_never_see_each_others_list(self):
+        self.list_orders(self.alice)
+        self.assertEqual(self.list_orders(self.bob)[1].keys(), {self.bob_order.order_number})
+        cache_status, orders = self.list_orders(self.alice)
+        self.assertEqual((cache_status, orders.keys()), ('HIT', {self.alice_order.order_number}))
+
+    def test_new_order_and_status_change_show_up(self):
+        self.list_orders(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_order = Order.objects.create(user=self.alice)
+        cache_status, orders = self.list_orders(self.alice)
+        self.assertEqual((cache_status, len(orders)), ('MISS', 2))
+
+        # Zoals de Mollie webhook: alleen de status kolommen
+        new_order.payment_status, new_order.status = 'paid', 'processing'
+        with self.captureOnCommitCallbacks(execute=True):
+            new_order.save(update_fields=['payment_status', 'status', 'updated_at'])
+        cache_status, orders = self.list_orders(self.alice)
+        self.assertEqual((cache_status, orders[new_order.order_number]['status']), ('MISS', 'processing'))
+
+    def test_recalculated_totals_show_up(self):
+        self.list_orders(self.alice)
+        OrderItem.objects.bulk_create([OrderItem(
+            order=self.alice_order, product=create_product(), product_name='Manuka Honing',
+            unit_price=Decimal('10.00'), quantity=1, total_price=Decimal('10.00'),
+        )])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice_order.recalculate_totals()
+
+        cache_status, orders = self.list_orders(self.alice)
+        self.assertEqual((cache_status, orders[self.alice_order.order_number]['subtotal']), ('MISS', '10.00'))
+
+    def test_local_cache_keeps_entries_briefly(self):
+        self.assertFalse(is_shared_cache())
+        self.assertEqual(get_cache_timeout('ORDER_LIST_CACHE_TIMEOUT', 60 * 60 * 24), 300)
+
+    def test_staff_share_one_list(self):
+        staff = [
+            User.objects.create_user(name, f'{name}@example.nl', 'wachtwoord', is_staff=True)
+            for name in ('eva', 'tom')
+        ]
+        self.assertEqual(self.list_orders(staff[0])[0], 'MISS')
+        cache_status, orders = self.list_orders(staff[1])
+        self.assertEqual((cache_status, len(orders)), ('HIT', 2))
+
+        # Een klant order wijzigen maakt ook de staff lijst ongeldig
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(user=self.bob)
+        self.assertEqual(self.list_orders(staff[1])[0], 'MISS')
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=5)
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    """Dubbelklik op "betalen": gelijktijdige requests met één sleutel plaatsen één order"""
+
+    threads = 4
+
+    def test_duplicates_wait_for_first_response(self):
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        address = Address.objects.create(
+            user=user, first_name='Jan', last_name='Jansen', street_address='Dorpsstraat',
+            house_number='1', postal_code='1234 AB', city='Utrecht',
+        )
+        cart = ShoppingCart.objects.create(user=user)
+        upsert_cart_items(cart.pk, {create_product().pk: 2})
+        responses = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def pay():
+            try:
+                client = Client()
+                client.force_login(user)
+                start.wait()
+                responses.append(client.post('/api/checkout/process/', {
+                    'shipping_address_id': address.pk,
+                    'billing_address_id': address.pk,
+                    'ideal_bank': 'ing',
+                    'terms_accepted': True,
+                }, content_type='application/json', secure=True, HTTP_IDEMPOTENCY_KEY='checkout-1'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=pay) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Order.objects.count(), 1)
+        created = [response for response in responses if response.status_code == 201]
+        self.assertTrue(created)
+        self.assertEqual({response.content for response in created}, {created[0].content})
+        for response in responses:
+            if response.status_code != 201:
+                self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+
+
+class ConcurrentOrderNumberTests(TransactionTestCase):
+    """Veel gelijktijdige checkouts: elk ordernummer precies één keer"""
+
+    threads = 8
+    orders_per_thread = 25
+
+    def tearDown(self):
+        order_numbers._blocks.clear()
+
+    def allocate_concurrently(self):
+        allocated = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def checkout():
+            try:
+                start.wait()
+                for _ in range(self.orders_per_thread):
+                    allocated.append(order_numbers.allocate_order_number())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=checkout) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(allocated)), self.threads * self.orders_per_thread)
+        return allocated
+
+    def test_concurrent_allocation_is_unique_and_gapless(self):
+        allocated = self.allocate_concurrently()
+        self.assertEqual(
+            sorted(allocated),
+            [order_numbers.format_order_number(timezone.localdate(), sequence)
+             for sequence in range(1, self.threads * self.orders_per_thread + 1)],
+        )
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=10)
+    def test_concurrent_block_allocation_is_unique(self):
+        self.allocate_concurrently()
+        self.assertEqual(OrderNumberSequence.objects.get().last_value, self.threads * self.orders_per_thread)
+
+    def test_order_create_allocates_distinct_numbers(self):
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        first = Order.objects.create(user=user)
+        second = Order.objects.create(user=user)
+        self.assertNotEqual(first.order_number, second.order_number)
+        self.assertTrue(first.order_number.startswith(f"HC{timezone.localdate():%Y%m%d}"))
+
+    def test_migration_seeds_counters_from_existing_orders(self):
+        seed = import_module('api.migrations.0010_order_number_sequence').seed_order_number_sequences
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        today = timezone.localdate()
+        for order_number in ('HC202601050007', 'HC202601050042', f"HC{today:%Y%m%d}0003", 'LEGACY-1'):
+            Order.objects.create(user=user, order_number=order_number)
+
+        seed(apps, None)
+
+        self.assertEqual(
+            dict(OrderNumberSequence.objects.values_list('day', 'last_value')),
+            {date(2026, 1, 5): 42, today: 3},
+        )
+        self.assertEqual(order_numbers.allocate_order_number(), order_numbers.format_order_number(today, 4))
+
+
+class ConcurrentStockReservationTests(TransactionTestCase):
+    """Flash sale: veel gelijktijdige checkouts op één product, nooit meer verkocht dan er is"""
+
+    threads = 12
+    stock = 20
+
+    def test_hot_product_is_never_oversold(self):
+        product = create_product(stock=self.stock)
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        orders = [Order.objects.create(user=user) for _ in range(self.threads)]
+        sold = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def checkout(order):
+            try:
+                start.wait()
+                for _ in range(3):
+                    try:
+                        with transaction.atomic():
+                            reserve_stock(order, {product.pk: 1})
+                        sold.append(1)
+                    except InsufficientStock:
+                        pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(sold), self.stock)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(StockReservation.objects.count(), self.stock)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pagination: gelijke sorteerwaarden vallen niet weg of dubbel, een foute cursor is een 404"""
+
+    def test_pages_through_orders_with_identical_created_at(self):
+        user = User.objects.create_user('klant', 'klant@example.nl', 'wachtwoord')
+        orders = [Order.objects.create(user=user) for _ in range(45)]
+        Order.objects.update(created_at=timezone.now())
+        self.client.force_login(user)
+
+        seen = []
+        url = '/api/orders/?pagination=cursor&fields=id'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+            seen.extend(order['id'] for order in response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(seen, sorted(order.pk for order in orders))
+
+    def test_malformed_cursor_is_not_a_server_error(self):
+        create_product()
+        for cursor in ('bogus', 'cD1bIngiXQ%3D%3D'):
+            response = self.client.get(f'/api/products/?cursor={cursor}', secure=True)
+            self.assertEqual(response.status_code, 404)
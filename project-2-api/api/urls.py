@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 # Router voor ViewSets
@@ -19,7 +19,7 @@ urlpatterns = [
     path('', include(router.urls)),
     
     # Authentication endpoints
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', views.HealClinicsTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/register/', views.register_user, name='register_user'),
     
     # Address management endpoints
@@ -28,6 +28,9 @@ urlpatterns = [
 
     # Shopping Cart endpoints
     path('cart/', views.shopping_cart, name='shopping_cart'),
+    path('cart/summary/', views.cart_summary, name='cart_summary'),
+    path('cart/batch/', views.cart_batch, name='cart_batch'),
+    path('cart/guest/', views.guest_cart, name='guest_cart'),
     path('cart/items/<int:item_id>/', views.cart_item_detail, name='cart_item_detail'),
     
     # Checkout endpoints
@@ -1,5 +1,5 @@
 # api/views.py - COMPLETE PERFORMANCE OPTIMIZED VERSION
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
@@ -8,10 +8,15 @@ from rest_framework import filters
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import APIException
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.views.decorators.vary import vary_on_headers
+from django.conf import settings
 from django.utils import timezone
+from django.http import HttpResponse
+from rest_framework.generics import get_object_or_404
 
 from django.contrib.auth.models import User
 from django.core.validators import validate_email
@@ -24,6 +29,18 @@ from django.core.cache import cache
 
 from .models import Post, Comment, Product, Order, Address
 from .serializers import PostSerializer, CommentSerializer, ProductSerializer, OrderSerializer
+from .filters import ProductSearchFilter
+from .pagination import CursorOptInPagination
+from .services.cart import MAX_BATCH_OPERATIONS, apply_cart_operations, get_cart, get_cart_summary, upsert_cart_items
+from .services.catalog_cache import get_catalog_last_modified, get_catalog_version, get_or_set_catalog_response
+from .services.checkout import SHIPPING_COST, place_order
+from .services.order_cache import get_or_set_order_list_response
+from .services.idempotency import idempotent
+from .services.inventory import InsufficientStock
+from .services.catalog_stats import build_catalog_stats, build_facets, count_active_products, get_catalog_stats
+from .services import catalog_fragments, featured_products
+from .services import guest_cart as guest_cart_service
+from .services.conditional import build_etag, get_not_modified_response, set_validators
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +62,8 @@ def api_status(request):
         'api_status': 'running',
         'endpoints': {
             'products': '/api/products/',
+            'product_facets': '/api/products/facets/',
+            'featured_products': '/api/products/featured/',
             'orders': '/api/orders/',
             'posts': '/api/posts/',
             'address_lookup': '/api/address/lookup/',
@@ -88,8 +107,8 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
 # E-commerce ViewSets (HEAVILY OPTIMIZED)
-@method_decorator(cache_page(60 * 15), name='list')
-@method_decorator(cache_page(60 * 60), name='retrieve')
+# Versioned catalog cache: product writes bump the version, so entries never go stale.
+# ETag/Last-Modified validators worden vóór de cache gecontroleerd (304 zonder serialisatie).
 @method_decorator(vary_on_headers('Accept-Language'), name='list')
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """HealClinics Producten API - FIXED Field References"""
@@ -97,23 +116,205 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.filter(is_active=True).order_by('name_nl')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CursorOptInPagination
+    cursor_ordering = ('name_nl', 'id')  # ?pagination=cursor - zie Product.Meta.indexes
     
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Search draait na ordering zodat de relevantie volgorde behouden blijft
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ProductSearchFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['name_nl', 'description']
+    search_fields = ['name_nl', 'short_description', 'description', 'features']  # Fallback zonder zoekindex
     ordering = ['name_nl']
     
     def get_queryset(self):
-        # SIMPLIFIED - No .only() to prevent field errors
-        return Product.objects.filter(is_active=True).order_by('name_nl')
+        queryset = Product.objects.filter(is_active=True).order_by('name_nl')
+        # ?fields= / ?omit= versmalt ook de SQL kolommen (keyset velden blijven nodig)
+        return ProductSerializer.restrict_queryset(
+            queryset, self.request.query_params, required=('name_nl',)
+        )
+    
+    def get_active_filters(self):
+        """Opgeschoonde filterset waarden van deze request (None als ze ongeldig zijn)"""
+        filterset = DjangoFilterBackend().get_filterset(self.request, self.get_queryset(), self)
+        if filterset is None or not filterset.is_valid():
+            return None
+        
+        return {
+            name: value for name, value in filterset.form.cleaned_data.items()
+            if value not in (None, '')
+        }
+    
+    def get_known_count(self):
+        """Telling voor de pagination uit de catalogus statistieken (geen COUNT query)"""
+        # Zoekresultaten zijn niet voorberekend
+        if self.request.query_params.get(ProductSearchFilter.search_param):
+            return None
+        
+        active_filters = self.get_active_filters()
+        if active_filters is None:
+            return None
+        return count_active_products(active_filters)
+    
+    def build_facets_response(self, request):
+        active_filters = self.get_active_filters()
+        if active_filters is None:
+            return Response({'detail': 'Ongeldige filter waarden.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if active_filters.pop('is_active', None) is False:
+            stats = build_catalog_stats(Product.objects.none())
+        elif request.query_params.get(ProductSearchFilter.search_param):
+            # Zoekresultaten zijn niet voorberekend: één GROUP BY over de treffers
+            queryset = ProductSearchFilter().filter_queryset(
+                request, Product.objects.filter(is_active=True), self
+            )
+            stats = build_catalog_stats(queryset)
+        else:
+            stats = get_catalog_stats()
+        
+        return Response(build_facets(stats, active_filters))
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Facet tellingen voor de huidige filter: per categorie, in de aanbieding,
+        op voorraad en per prijs bucket. Komt uit de voorberekende catalogus
+        statistieken (geen GROUP BY per request).
+        """
+        return get_or_set_catalog_response(request, lambda: self.build_facets_response(request))
+    
+    def build_featured_payload(self):
+        products = list(featured_products.get_featured_queryset().only('id', 'updated_at'))
+        return catalog_fragments.join_fragments(self.get_product_fragments(products))
+    
+    @action(detail=False, methods=['get'])
+    def featured(self, request):
+        """
+        Homepage: featured producten (Meta.ordering, FEATURED_PRODUCTS_COUNT).
+        
+        De payload staat in het geheugen van het proces en wordt alleen opnieuw
+        opgebouwd als een featured of actief product wijzigt.
+        """
+        if not self.renders_json():
+            serializer = self.get_serializer(featured_products.get_featured_queryset(), many=True)
+            return Response(serializer.data)
+        
+        field_names = ProductSerializer.get_sparse_field_names(request.query_params)
+        variant = catalog_fragments.get_fragment_variant(request, field_names)
+        version, payload = featured_products.get_featured_payload(variant, self.build_featured_payload)
+        
+        etag = build_etag(request, version)
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(HttpResponse(payload, content_type='application/json'), etag)
+    
+    def renders_json(self):
+        """Fragmenten alleen voor JSON; de browsable API gebruikt de normale serializer"""
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return renderer is not None and renderer.format == 'json'
+    
+    def get_product_fragments(self, products):
+        """Voorgerenderde JSON per product; alleen gewijzigde producten worden geserialiseerd"""
+        field_names = ProductSerializer.get_sparse_field_names(self.request.query_params)
+        variant = catalog_fragments.get_fragment_variant(self.request, field_names)
+        
+        def render_missing(product_ids):
+            missing = list(self.get_queryset().filter(pk__in=product_ids))
+            serializer = self.get_serializer(missing, many=True)
+            return {
+                product.pk: catalog_fragments.render_fragment(data)
+                for product, data in zip(missing, serializer.data)
+            }
+        
+        return catalog_fragments.get_product_fragments(products, variant, render_missing)
+    
+    def fragment_list(self, request):
+        """List response opgebouwd uit fragmenten: één id query plus byte concatenatie"""
+        queryset = self.filter_queryset(self.get_queryset()).only('id', 'updated_at', 'name_nl')
+        
+        page = self.paginate_queryset(queryset)
+        products = list(page) if page is not None else list(queryset)
+        fragments = self.get_product_fragments(products)
+        
+        if page is None:
+            body = catalog_fragments.join_fragments(fragments)
+        else:
+            envelope = self.get_paginated_response([]).data
+            body = catalog_fragments.render_paginated_body(envelope, fragments)
+        return HttpResponse(body, content_type='application/json')
+    
+    def get_list_validators(self):
+        """
+        ETag uit de catalogus versie (elke product write verhoogt hem) plus de URL.
+
+        Geen query per request: de versie staat in de cache en Last-Modified
+        wordt één keer per versie bepaald. Een ?search= draait alleen in de list zelf.
+        """
+        version = get_catalog_version()
+        last_modified = get_catalog_last_modified(version)
+        # Last-Modified erbij: met een per-proces cache mist deze worker misschien
+        # versie bumps, maar de (kort gecachte) MAX(updated_at) loopt wel mee
+        etag = build_etag(self.request, version, last_modified.isoformat() if last_modified else '')
+        return etag, last_modified
+    
+    def build_retrieve_response(self, request, product, *args, **kwargs):
+        if not self.renders_json():
+            return super().retrieve(request, *args, **kwargs)
+        
+        fragments = self.get_product_fragments([product])
+        if not fragments:
+            return Response({'detail': 'Niet gevonden.'}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(fragments[0], content_type='application/json')
+    
+    def retrieve(self, request, *args, **kwargs):
+        # Eén primary key lookup voor de validators
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).only('id', 'updated_at')
+        product = get_object_or_404(queryset, **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        
+        etag = build_etag(request, product.updated_at.isoformat())
+        not_modified = get_not_modified_response(request, etag, product.updated_at)
+        if not_modified is not None:
+            return not_modified
+        
+        response = get_or_set_catalog_response(
+            request,
+            lambda: self.build_retrieve_response(request, product, *args, **kwargs),
+            extra=etag,
+        )
+        return set_validators(response, etag, product.updated_at)
+    
+    def build_list_response(self, request, *args, **kwargs):
+        if self.renders_json():
+            response = self.fragment_list(request)
+        else:
+            response = super().list(request, *args, **kwargs)
+        response['X-Total-Products'] = count_active_products()
+        if getattr(self, 'search_truncated', False):
+            # count en latere pagina's beslaan alleen de beste PRODUCT_SEARCH_MAX_RESULTS treffers
+            response['X-Search-Truncated'] = str(settings.PRODUCT_SEARCH_MAX_RESULTS)
+        return response
     
     def list(self, request, *args, **kwargs):
         try:
             # Enhanced error handling
-            response = super().list(request, *args, **kwargs)
-            response['X-Cache-Status'] = 'HIT' if hasattr(request, '_cache_hit') else 'MISS'
-            response['X-Total-Products'] = self.get_queryset().count()
-            return response
+            etag, last_modified = self.get_list_validators()
+            not_modified = get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            
+            # De ETag zit in de cache key: de gecachte body hoort altijd bij de validators
+            response = get_or_set_catalog_response(
+                request,
+                lambda: self.build_list_response(request, *args, **kwargs),
+                extra=etag,
+            )
+            if getattr(response, 'catalog_stale', False):
+                # Tellingen van vóór de laatste write: geen validators voor deze body
+                return response
+            return set_validators(response, etag, last_modified)
+        except APIException:
+            # Client fouten (ongeldige cursor of filter) houden hun eigen status (404/400)
+            raise
         except Exception as e:
             logger.error(f"ProductViewSet list error: {e}")
             return Response({
@@ -121,21 +322,54 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@method_decorator(cache_page(60 * 5), name='list')
 class OrderViewSet(viewsets.ModelViewSet):
     """Bestellingen API - Optimized"""
     # FIXED: Added queryset attribute - REQUIRED FOR ROUTER  
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CursorOptInPagination
+    cursor_ordering = ('-created_at', 'id')  # ?pagination=cursor - zie Order.Meta.indexes
     
     def get_queryset(self):
         # Optimize with select_related and prefetch_related
-        base_queryset = Order.objects.select_related('user').prefetch_related('items__product')
+        base_queryset = Order.objects.select_related('user')
+        
+        # ?fields= / ?omit= : alleen benodigde kolommen, items alleen als ze gevraagd zijn
+        fields = OrderSerializer.get_sparse_field_names(self.request.query_params)
+        if fields is None or 'items' in fields:
+            base_queryset = base_queryset.prefetch_related('items__product')
+        base_queryset = OrderSerializer.restrict_queryset(
+            base_queryset, self.request.query_params, required=('user', 'created_at')
+        )
         
         if self.request.user.is_staff:
             return base_queryset.all()
         return base_queryset.filter(user=self.request.user)
+    
+    def build_list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        # Per gebruiker gecached (staff: gedeeld), ongeldig bij elke order wijziging
+        return get_or_set_order_list_response(
+            request,
+            lambda: self.build_list_response(request, *args, **kwargs),
+        )
+    
+    def retrieve(self, request, *args, **kwargs):
+        # Conditional GET op Order.updated_at: 304 zonder de order te serialiseren
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = Order.objects.all() if request.user.is_staff else Order.objects.filter(user=request.user)
+        order = get_object_or_404(queryset.only('id', 'updated_at'), **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        
+        etag = build_etag(request, order.updated_at.isoformat())
+        not_modified = get_not_modified_response(request, etag, order.updated_at)
+        if not_modified is not None:
+            return not_modified
+        
+        response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, order.updated_at)
 
 # JWT Token (enhanced with logging)
 class HealClinicsTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -169,6 +403,17 @@ class HealClinicsTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class HealClinicsTokenObtainPairView(TokenObtainPairView):
     serializer_class = HealClinicsTokenObtainPairSerializer
+    
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        
+        # Gast winkelwagen (cookie) samenvoegen met de wagen van de gebruiker
+        response = Response(serializer.validated_data, status=status.HTTP_200_OK)
+        return guest_cart_service.merge_guest_cart(request, response, serializer.user)
 
 # User Registration
 @api_view(['POST'])
@@ -225,7 +470,7 @@ def register_user(request):
         
         logger.info(f"New user registered: {user.email}")
         
-        return Response({
+        response = Response({
             'message': 'Account succesvol aangemaakt! Welkom bij HealClinics Nederland!',
             'user': {
                 'id': user.id,
@@ -240,6 +485,7 @@ def register_user(request):
                 'refresh': str(refresh),
             }
         }, status=status.HTTP_201_CREATED)
+        return guest_cart_service.merge_guest_cart(request, response, user)
         
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
@@ -422,10 +668,8 @@ def user_address_detail(request, address_id):
 
 # Django Checkout Views (if you have these models)
 try:
-    from .models import OrderItem, ShoppingCart, CartItem
+    from .models import ShoppingCart, CartItem
     from .serializers import ShoppingCartSerializer, CartItemSerializer, CheckoutSerializer
-    from decimal import Decimal
-    from django.db import transaction
 
     # Nederlandse iDEAL banken configuratie
     IDEAL_BANKS = [
@@ -442,44 +686,153 @@ try:
     # Cart Management Views
     @api_view(['GET', 'POST'])
     @permission_classes([IsAuthenticated])
+    @idempotent
     def shopping_cart(request):
         """Winkelwagen beheer voor ingelogde gebruikers"""
         
-        # Get or create cart
-        cart, created = ShoppingCart.objects.get_or_create(user=request.user)
-        
         if request.method == 'GET':
-            serializer = ShoppingCartSerializer(cart)
+            # Wagen, items en producten in twee queries
+            serializer = ShoppingCartSerializer(get_cart(request.user))
             return Response(serializer.data)
         
         elif request.method == 'POST':
+            cart, created = ShoppingCart.objects.get_or_create(user=request.user)
+            
             # Add item to cart
             product_id = request.data.get('product_id')
-            quantity = int(request.data.get('quantity', 1))
+            try:
+                quantity = int(request.data.get('quantity', 1))
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity < 1:
+                return Response({
+                    'error': 'Ongeldig aantal'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             try:
-                product = Product.objects.get(id=product_id, is_active=True)
-            except Product.DoesNotExist:
+                product = Product.objects.only('id', 'name_nl').get(id=product_id, is_active=True)
+            except (Product.DoesNotExist, ValueError, TypeError):
                 return Response({
                     'error': 'Product niet gevonden'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # Add or update cart item
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            # Add or update cart item: één upsert, quantity wordt in de database opgeteld
+            upsert_cart_items(cart.pk, {product.pk: quantity})
             
+            # Teller is via F() bijgewerkt: alleen de rij opnieuw lezen
+            cart.refresh_from_db(fields=['item_count', 'subtotal'])
             return Response({
                 'message': f'{product.name_nl} toegevoegd aan winkelwagen',
                 'cart_total_items': cart.get_total_items()
             })
+    
+    @api_view(['GET'])
+    @permission_classes([IsAuthenticated])
+    def cart_summary(request):
+        """Winkelwagen badge/samenvatting uit de opgeslagen tellers (één rij, geen items)"""
+        return Response(get_cart_summary(request.user))
 
+    def parse_cart_operations(operations_data):
+        """
+        Valideer een lijst {op, product_id, quantity} operaties.
+        
+        Geeft (operaties, fouten) terug; operaties als (op, product_id, aantal).
+        Alle producten worden in één in_bulk query gecontroleerd.
+        """
+        if not isinstance(operations_data, list) or not operations_data:
+            return [], [{'error': 'Geef een lijst met operaties op'}]
+        if len(operations_data) > MAX_BATCH_OPERATIONS:
+            return [], [{'error': f'Maximaal {MAX_BATCH_OPERATIONS} operaties per request'}]
+        
+        operations = []
+        errors = []
+        for index, operation in enumerate(operations_data):
+            if not isinstance(operation, dict):
+                errors.append({'index': index, 'error': 'Ongeldige operatie'})
+                continue
+            op = operation.get('op', 'add')
+            try:
+                product_id = int(operation.get('product_id'))
+                quantity = int(operation.get('quantity', 0 if op == 'remove' else 1))
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'Ongeldig product_id of aantal'})
+                continue
+            if op not in ('add', 'set', 'remove'):
+                errors.append({'index': index, 'error': f'Onbekende operatie: {op}'})
+            elif quantity < (1 if op == 'add' else 0):
+                errors.append({'index': index, 'error': 'Ongeldig aantal'})
+            else:
+                operations.append((index, op, product_id, quantity))
+        
+        # Alle producten in één query; verwijderen mag ook voor inactieve producten
+        products = Product.objects.filter(is_active=True).only('id').order_by().in_bulk(
+            {product_id for _, op, product_id, _ in operations if op != 'remove'}
+        )
+        for index, op, product_id, _ in operations:
+            if op != 'remove' and product_id not in products:
+                errors.append({'index': index, 'error': f'Product {product_id} niet gevonden'})
+        
+        return [operation[1:] for operation in operations], errors
+    
+    @api_view(['POST'])
+    @permission_classes([IsAuthenticated])
+    def cart_batch(request):
+        """
+        Meerdere winkelwagen wijzigingen in één request (opgeslagen wagen herstellen, opnieuw bestellen).
+        
+        Body: {"operations": [{"op": "add"|"set"|"remove", "product_id": 1, "quantity": 2}, ...]}
+        Alles of niets: bij een ongeldige operatie wordt niets toegepast.
+        """
+        operations_data = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        operations, errors = parse_cart_operations(operations_data)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        cart, created = ShoppingCart.objects.get_or_create(user=request.user)
+        apply_cart_operations(cart.pk, operations)
+        
+        # Eén keer de herberekende wagen teruggeven
+        serializer = ShoppingCartSerializer(get_cart(request.user))
+        return Response(serializer.data)
+    
+    @api_view(['GET', 'POST', 'DELETE'])
+    @permission_classes([AllowAny])
+    def guest_cart(request):
+        """
+        Winkelwagen voor bezoekers zonder account, in een signed cookie.
+        
+        Geen database writes: GET leest de producten in één query, POST
+        (zelfde operaties als /api/cart/batch/, of één {product_id, quantity})
+        schrijft alleen de cookie. Bij login/registratie wordt hij samengevoegd.
+        """
+        items = guest_cart_service.read_guest_cart(request)
+        
+        if request.method == 'POST':
+            data = request.data
+            if isinstance(data, dict) and 'operations' not in data:
+                data = [data]
+            elif isinstance(data, dict):
+                data = data['operations']
+            operations, errors = parse_cart_operations(data)
+            if errors:
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+            items = guest_cart_service.apply_guest_operations(items, operations)
+            if len(items) > guest_cart_service.MAX_GUEST_CART_PRODUCTS:
+                return Response({
+                    'error': f'Maximaal {guest_cart_service.MAX_GUEST_CART_PRODUCTS} producten in een gast winkelwagen'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        elif request.method == 'DELETE':
+            items = {}
+        
+        products = Product.objects.filter(is_active=True).order_by().in_bulk(list(items))
+        cart_items, data = guest_cart_service.build_guest_cart(items, products)
+        data['items'] = CartItemSerializer(cart_items, many=True, context={'request': request}).data
+        
+        response = Response(data)
+        if request.method != 'GET':
+            guest_cart_service.write_guest_cart(request, response, items)
+        return response
+    
     @api_view(['PUT', 'DELETE'])
     @permission_classes([IsAuthenticated])
     def cart_item_detail(request, item_id):
@@ -521,17 +874,16 @@ try:
     def checkout_init(request):
         """Initialize Nederlandse checkout proces"""
         
-        # Get user cart
-        try:
-            cart = ShoppingCart.objects.get(user=request.user)
-            if not cart.items.exists():
-                return Response({
-                    'error': 'Je winkelwagen is leeg'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        except ShoppingCart.DoesNotExist:
+        # Get user cart (items en producten geprefetcht, geen aparte exists() query)
+        cart = get_cart(request.user, create=False)
+        if cart is None:
             return Response({
                 'error': 'Geen winkelwagen gevonden'
             }, status=status.HTTP_400_BAD_REQUEST)
+        if not cart.items.all():
+            return Response({
+                'error': 'Je winkelwagen is leeg'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         # Get user addresses
         addresses = Address.objects.filter(user=request.user)
@@ -552,12 +904,13 @@ try:
             'cart': cart_serializer.data,
             'addresses': addresses_data,
             'ideal_banks': IDEAL_BANKS,
-            'shipping_cost': Decimal('4.95'),  # Nederlandse verzendkosten
+            'shipping_cost': SHIPPING_COST,  # Zelfde constante als place_order
             'tax_rate': 0.21,  # Nederlandse BTW
         })
 
     @api_view(['POST'])
     @permission_classes([IsAuthenticated])
+    @idempotent
     def process_checkout(request):
         """Nederlandse checkout verwerking"""
         
@@ -569,86 +922,55 @@ try:
         
         validated_data = serializer.validated_data
         
-        # Get user cart
-        try:
-            cart = ShoppingCart.objects.get(user=request.user)
-            if not cart.items.exists():
-                return Response({
-                    'error': 'Je winkelwagen is leeg'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        except ShoppingCart.DoesNotExist:
+        # Validate addresses (één query voor beide)
+        address_ids = {validated_data['shipping_address_id'], validated_data['billing_address_id']}
+        addresses = Address.objects.filter(user=request.user).in_bulk(address_ids)
+        if len(addresses) != len(address_ids):
             return Response({
-                'error': 'Geen winkelwagen gevonden'
+                'error': 'Geselecteerd adres niet gevonden'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Validate addresses
         try:
-            shipping_address = Address.objects.get(
-                id=validated_data['shipping_address_id'],
-                user=request.user
+            # TODO: Process payment with iDEAL (integrate payment provider)
+            # For now: één insert met de eindstatus (gesimuleerde betaling)
+            placed = place_order(
+                request.user,
+                shipping_address=addresses[validated_data['shipping_address_id']],
+                billing_address=addresses[validated_data['billing_address_id']],
+                payment_method=validated_data.get('payment_method', 'ideal'),
+                ideal_bank=validated_data.get('ideal_bank', ''),
+                customer_notes=validated_data.get('customer_notes', ''),
+                status='confirmed',
+                payment_status='paid',
             )
-            billing_address = Address.objects.get(
-                id=validated_data['billing_address_id'],
-                user=request.user
-            )
-        except Address.DoesNotExist:
+        except InsufficientStock as e:
             return Response({
-                'error': 'Geselecteerd adres niet gevonden'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            with transaction.atomic():
-                # Create order
-                order = Order.objects.create(
-                    user=request.user,
-                    shipping_address=shipping_address,
-                    billing_address=billing_address,
-                    payment_method=validated_data.get('payment_method', 'ideal'),
-                    ideal_bank=validated_data.get('ideal_bank', ''),
-                    customer_notes=validated_data.get('customer_notes', ''),
-                    shipping_cost=Decimal('4.95'),  # Nederlandse verzendkosten
-                )
-                
-                # Create order items from cart
-                for cart_item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        product=cart_item.product,
-                        product_name=cart_item.product.name_nl,
-                        product_sku=getattr(cart_item.product, 'sku', ''),
-                        unit_price=cart_item.product.price,
-                        quantity=cart_item.quantity,
-                        total_price=cart_item.get_total_price(),
-                    )
-                
-                # Calculate order totals
-                order.calculate_totals()
-                order.save()
-                
-                # Clear cart after successful order
-                cart.items.all().delete()
-                
-                # TODO: Process payment with iDEAL (integrate payment provider)
-                # For now, mark as pending
-                order.status = 'confirmed'
-                order.payment_status = 'paid'  # Simulate successful payment
-                order.save()
-                
-                # Prepare response
-                order_serializer = OrderSerializer(order)
-                
-                return Response({
-                    'message': 'Bestelling succesvol geplaatst!',
-                    'order': order_serializer.data,
-                    'order_number': order.order_number,
-                    'payment_url': f'/checkout/payment/{order.id}/'  # Voor iDEAL redirect
-                }, status=status.HTTP_201_CREATED)
-        
+                'error': 'Niet alle producten zijn nog op voorraad',
+                'unavailable': [
+                    {'product_id': product_id, 'requested': requested, 'available': available}
+                    for product_id, (requested, available) in sorted(e.shortages.items())
+                ],
+            }, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             logger.error(f"Checkout processing error: {str(e)}")
             return Response({
                 'error': f'Fout bij verwerken bestelling: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        if placed is None:
+            return Response({
+                'error': 'Je winkelwagen is leeg'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        order, _ = placed
+        order_data = OrderSerializer(order).data
+        
+        return Response({
+            'message': 'Bestelling succesvol geplaatst!',
+            'order': order_data,
+            'order_number': order.order_number,
+            'payment_url': f'/checkout/payment/{order.id}/'  # Voor iDEAL redirect
+        }, status=status.HTTP_201_CREATED)
 
     @api_view(['GET'])
     @permission_classes([IsAuthenticated]) 
@@ -85,6 +85,15 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Schrijvende transacties wachten op elkaar i.p.v. "database is locked"
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # Bestand i.p.v. shared in-memory: concurrency tests gebruiken meerdere connecties
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 
@@ -161,6 +170,14 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
     'cache-control',  # Added for caching
     'pragma',         # Added for caching
+    'if-none-match',      # Conditional GET (ETag)
+    'if-modified-since',  # Conditional GET (Last-Modified)
+    'idempotency-key',    # Veilig herhalen van checkout/winkelwagen POSTs
+]
+
+# Validators leesbaar voor de frontend
+CORS_EXPOSE_HEADERS = [
+    'ETag', 'Last-Modified', 'X-Total-Products', 'X-Search-Truncated', 'Idempotent-Replayed', 'Retry-After',
 ]
 
 # Allow all standard HTTP methods
@@ -233,6 +250,15 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = FILE_UPLOAD_MAX_MEMORY_SIZE
 ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
 
+# Responsive product afbeeldingen: variant -> max breedte (WebP + JPEG per variant)
+PRODUCT_IMAGE_VARIANTS = {
+    'thumbnail': 150,
+    'card': 400,
+    'detail': 800,
+    'zoom': 1600,
+}
+PRODUCT_IMAGE_WORKERS = 2  # Worker threads voor variant generatie
+
 # ============================================================================
 # MOLLIE PAYMENT INTEGRATION - HEALCLINICS
 # ============================================================================
@@ -254,11 +280,20 @@ CACHES = {
         'LOCATION': 'healclinics-cache',
         'TIMEOUT': 300,  # 5 minutes default
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 10000,  # Ruimte voor per-product catalogus fragmenten
         }
     }
 }
 
+# Product catalogus cache: versioned keys, invalidated on every Product write.
+# Use a shared backend (Redis/Memcached) when running multiple workers,
+# otherwise a version bump only reaches the worker that saved the product.
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 days with a shared backend (versioned keys never go stale)
+# Bovengrens voor cache timeouts zolang de cache per proces is (LocMem): andere
+# workers zien versie bumps niet, dus hun entries moeten snel verlopen
+LOCAL_CACHE_MAX_TIMEOUT = 60 * 5
+
 # ============================================================================
 # LOGGING CONFIGURATION
 # ============================================================================
@@ -345,6 +380,19 @@ ORDER_EXPIRY_HOURS = 24
 PAYMENT_TIMEOUT_MINUTES = 15
 PAYMENT_RETRY_ATTEMPTS = 3
 
+# Ordernummers per proces in blokken reserveren (1 = strikt oplopend, één UPDATE per order)
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 1))
+
+# Idempotency-Key: bewaartermijn van responses en wachttijd voor dubbele requests.
+# Een wachtend dubbel request houdt een worker bezet: bedoeld voor threaded of
+# async workers. Met alleen sync workers op 0 zetten (meteen 409 + Retry-After).
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_WAIT_SECONDS = 3
+
+# Order lijst cache per gebruiker (versie gekeyed, zie services.order_cache).
+# Alleen met een gedeelde cache zo lang; met LocMem geldt LOCAL_CACHE_MAX_TIMEOUT
+ORDER_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Shipping settings
 FREE_SHIPPING_THRESHOLD = 50.00  # Free shipping above €50
 DEFAULT_SHIPPING_COST = 4.95
@@ -352,6 +400,14 @@ DEFAULT_SHIPPING_COST = 4.95
 # Product settings
 PRODUCTS_PER_PAGE = 12
 FEATURED_PRODUCTS_COUNT = 8
+PRODUCT_SEARCH_MAX_RESULTS = 1000  # Max aantal gerangschikte zoekresultaten (daarboven: X-Search-Truncated)
+CATALOG_PRICE_BUCKETS = [10, 25, 50, 100]  # Prijs facet grenzen in EUR (incl. BTW)
+CATALOG_STATS_REFRESH_DELAY = 2  # Seconden: product writes binnen dit venster delen één rebuild
+# Prebuilt catalogus voor de serverless products handler (manage.py build_catalog_snapshot)
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', str(BASE_DIR / 'catalog_snapshot.jsonl'))
+
+# Cart settings
+CART_SWEEP_MAX_AGE_DAYS = int(os.getenv('CART_SWEEP_MAX_AGE_DAYS', 90))  # manage.py sweep_carts
 
 # ✅ PRODUCTION: Security settings
 if not DEBUG: